@@ -1,11 +1,16 @@
 # auth_backend.py
 from __future__ import annotations
-import json, os, time, requests, uuid
+import os, threading, time, uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any, Dict, Optional
+import http_client as http
+import store
 
 GW_DIR: Path = Path.home() / ".gwlauncher"
 ACCOUNTS_FILE: Path = GW_DIR / "accounts.json"
+SESSION_FILE: Path = GW_DIR / "session.json"
 
 CLIENT_ID = "54fd49e4-2103-4044-9603-2b028c814ec3"
 
@@ -17,100 +22,219 @@ XSTS_AUTH = "https://xsts.auth.xboxlive.com/xsts/authorize"
 MC_LOGIN = "https://api.minecraftservices.com/authentication/login_with_xbox"
 MC_PROFILE = "https://api.minecraftservices.com/minecraft/profile"
 
+LAUNCH_MARGIN = 60
+REFRESH_AHEAD = 15 * 60
+REFRESH_WORKERS = 4
+RETRY_BASE = 60
+RETRY_MAX = 3600
+_accounts_lock = threading.RLock()
+_refresh_locks: Dict[str, threading.Lock] = {}
+_retry: Dict[str, tuple[int, float]] = {}
+_refresher: Optional[threading.Thread] = None
+_wake = threading.Event()
+_accounts = store.open_store(ACCOUNTS_FILE)
+_session = store.open_store(SESSION_FILE)
+
 def _ensure_dir() -> None:
     GW_DIR.mkdir(parents=True, exist_ok=True)
     if os.name == "posix":
         os.chmod(GW_DIR, 0o755)
 
-def _read_json(p: Path, default: Any) -> Any:
-    if not p.exists():
-        return default
-    try:
-        return json.loads(p.read_text(encoding="utf-8"))
-    except Exception:
-        return default
+def list_accounts() -> Dict[str, Any]:
+    return _accounts.read()
 
-def _write_json(p: Path, data: Any) -> None:
-    p.parent.mkdir(parents=True, exist_ok=True)
-    p.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
-    if os.name == "posix":
-        os.chmod(p, 0o644)
+def _get_account(account_id: Optional[str]) -> Optional[Dict[str, Any]]:
+    acc = _accounts.get(account_id) if account_id else None
+    return {"id": account_id, **acc} if acc else None
 
-def list_accounts() -> Dict[str, Any]:
-    return _read_json(ACCOUNTS_FILE, {})
+def _update_account(account_id: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+    with _accounts.transaction() as data:
+        if account_id not in data:
+            raise RuntimeError("Cuenta no encontrada")
+        data[account_id].update(fields)
+        return {"id": account_id, **data[account_id]}
 
-def _save_accounts(data: Dict[str, Any]) -> None:
-    _write_json(ACCOUNTS_FILE, data)
+def _not_after(value: str) -> int:
+    try:
+        return int(datetime.strptime(value[:19], "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc).timestamp())
+    except (TypeError, ValueError):
+        return 0
 
 def get_account_by_name(name: str) -> Optional[Dict[str, Any]]:
-    for aid, acc in list_accounts().items():
-        if acc.get("name") == name:
-            return {"id": aid, **acc}
-    return None
+    return _get_account(_accounts.lookup("name", name))
+
+def get_account_by_uuid(account_uuid: str) -> Optional[Dict[str, Any]]:
+    return _get_account(_accounts.lookup("uuid", account_uuid))
 
 def remove_account(account_id: str) -> None:
-    data = list_accounts()
-    if account_id in data:
-        del data[account_id]
-        _save_accounts(data)
+    with _accounts.transaction() as data:
+        data.pop(account_id, None)
+        remaining = next(iter(data), None)
+    if get_active_account_id() == account_id:
+        set_active_account(remaining)
+
+def get_active_account_id() -> Optional[str]:
+    return _session.get("active")
+
+def set_active_account(account_id: Optional[str]) -> None:
+    with _session.transaction() as data:
+        data["active"] = account_id
+
+def resolve_account(account_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    for aid in (account_id, get_active_account_id(), next(iter(_accounts.keys()), None)):
+        acc = _get_account(aid)
+        if acc:
+            return acc
+    return None
 
 def begin_device_login() -> Dict[str, str]:
-    resp = requests.post(OAUTH_DEVICE_CODE, data={
+    resp = http.post(OAUTH_DEVICE_CODE, data={
         "client_id": CLIENT_ID,
         "scope": "XboxLive.signin offline_access"
     }, headers={"Content-Type": "application/x-www-form-urlencoded"})
     resp.raise_for_status()
     return resp.json()
 
-def poll_device_login(device_code: str, interval: int = 3, timeout: int = 300) -> Dict[str, str]:
-    start = time.time()
-    cur = max(1, int(interval))
-    while True:
-        if time.time() - start >= timeout:
+class DeviceLogin:
+    def __init__(self, step: Dict[str, Any], timeout: int = 300):
+        self.device_code = step["device_code"]
+        self.interval = max(1, int(step.get("interval", 3)))
+        self.deadline = time.time() + min(timeout, int(step.get("expires_in", timeout)))
+        self.cancelled = threading.Event()
+
+    def cancel(self) -> None:
+        self.cancelled.set()
+
+    def poll(self) -> Optional[Dict[str, str]]:
+        if self.cancelled.is_set():
+            raise RuntimeError("Inicio de sesión cancelado")
+        if time.time() >= self.deadline:
             raise RuntimeError("Tiempo de espera agotado")
-        time.sleep(cur)
-        resp = requests.post(OAUTH_TOKEN, data={
+        resp = http.post(OAUTH_TOKEN, data={
             "grant_type": "urn:ietf:params:oauth:grant-type:device_code",
             "client_id": CLIENT_ID,
-            "device_code": device_code,
+            "device_code": self.device_code,
         })
         data = resp.json()
         if "error" in data:
             err = data["error"]
             if err in ("authorization_pending",):
-                continue
+                return None
             if err in ("slow_down",):
-                cur += 1
-                continue
-            if err in ("authorization_declined", "expired_token", "bad_verification_code", "access_denied"):
-                raise RuntimeError(f"Error en login: {data}")
+                self.interval += 1
+                return None
             raise RuntimeError(f"Error en login: {data}")
         return data
 
+    def wait(self) -> Dict[str, str]:
+        while True:
+            if self.cancelled.wait(self.interval):
+                raise RuntimeError("Inicio de sesión cancelado")
+            tokens = self.poll()
+            if tokens:
+                return tokens
+
+def poll_device_login(device_code: str, interval: int = 3, timeout: int = 300) -> Dict[str, str]:
+    return DeviceLogin({"device_code": device_code, "interval": interval}, timeout).wait()
+
+def _ms_fields(tokens: Dict[str, Any], refresh_token: str = "") -> Dict[str, Any]:
+    return {
+        "ms_access_token": tokens["access_token"],
+        "refresh_token": tokens.get("refresh_token", refresh_token),
+        "ms_expires_at": int(time.time()) + int(tokens.get("expires_in", 3600)),
+    }
+
 def refresh_account(account_id: str) -> Dict[str, Any]:
-    data = list_accounts()
-    acc = data.get(account_id)
+    acc = _accounts.get(account_id)
     if not acc:
         raise RuntimeError("Cuenta no encontrada")
-    resp = requests.post(OAUTH_TOKEN, data={
+    if acc.get("needs_login"):
+        raise RuntimeError("La sesión expiró, vuelve a iniciar sesión")
+    resp = http.post(OAUTH_TOKEN, data={
         "grant_type": "refresh_token",
         "client_id": CLIENT_ID,
         "refresh_token": acc["refresh_token"],
     })
     if resp.status_code != 200:
+        try:
+            error = resp.json().get("error")
+        except ValueError:
+            error = None
+        if error == "invalid_grant":
+            _update_account(account_id, {"needs_login": True})
+            raise RuntimeError("La sesión expiró, vuelve a iniciar sesión")
         raise RuntimeError("Error al refrescar token")
-    tokens = resp.json()
-    acc.update({
-        "ms_access_token": tokens["access_token"],
-        "refresh_token": tokens.get("refresh_token", acc["refresh_token"]),
-        "updated_at": int(time.time())
-    })
-    data[account_id] = acc
-    _save_accounts(data)
-    return {"id": account_id, **acc}
+    return _update_account(account_id, {**_ms_fields(resp.json(), acc["refresh_token"]), "updated_at": int(time.time())})
+
+def _valid(acc: Dict[str, Any], token: str, expires: str, margin: int) -> bool:
+    return bool(acc.get(token)) and acc.get(expires, 0) - margin > time.time()
+
+def ensure_tokens(account_id: str, margin: int = LAUNCH_MARGIN) -> Dict[str, Any]:
+    with _accounts_lock:
+        lock = _refresh_locks.setdefault(account_id, threading.Lock())
+    with lock:
+        acc = _accounts.get(account_id)
+        if not acc:
+            raise RuntimeError("Cuenta no encontrada")
+        if _valid(acc, "mc_access_token", "mc_expires_at", margin):
+            return {"id": account_id, **acc}
+        fields: Dict[str, Any] = {}
+        if not _valid(acc, "xsts_token", "xsts_expires_at", margin):
+            if not _valid(acc, "xbl_token", "xbl_expires_at", margin):
+                if not _valid(acc, "ms_access_token", "ms_expires_at", margin):
+                    acc = refresh_account(account_id)
+                fields["xbl_token"], fields["xbl_expires_at"] = _auth_xbox(acc["ms_access_token"])
+                acc = {**acc, **fields}
+            xsts, uhs, xsts_expires = _auth_xsts(acc["xbl_token"])
+            fields.update(xsts_token=xsts, uhs=uhs, xsts_expires_at=xsts_expires)
+            acc = {**acc, **fields}
+        fields["mc_access_token"], fields["mc_expires_at"] = _auth_minecraft(acc["xsts_token"], acc["uhs"])
+        fields["updated_at"] = int(time.time())
+        return _update_account(account_id, fields)
+
+def _next_refresh() -> float:
+    with _accounts_lock:
+        retry = dict(_retry)
+    due = [retry[aid][1] if aid in retry else acc.get("mc_expires_at", 0) - REFRESH_AHEAD for aid, acc in list_accounts().items() if not acc.get("needs_login")]
+    return min(due) if due else time.time() + 3600
 
-def _auth_xbox(ms_access_token: str) -> str:
-    resp = requests.post(XBOX_AUTH, json={
+def refresh_all_accounts(margin: int = REFRESH_AHEAD, max_workers: int = REFRESH_WORKERS) -> Dict[str, Optional[str]]:
+    now = time.time()
+    with _accounts_lock:
+        ids = [aid for aid, acc in list_accounts().items() if not acc.get("needs_login") and _retry.get(aid, (0, 0))[1] <= now]
+    if not ids:
+        return {}
+    def refresh(account_id: str) -> Optional[str]:
+        try:
+            ensure_tokens(account_id, margin)
+        except Exception as e:
+            with _accounts_lock:
+                failures = _retry.get(account_id, (0, 0))[0] + 1
+                _retry[account_id] = (failures, time.time() + min(RETRY_MAX, RETRY_BASE * 2 ** (failures - 1)))
+            return str(e)
+        with _accounts_lock:
+            _retry.pop(account_id, None)
+        return None
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(ids)), thread_name_prefix="gw-auth") as pool:
+        return dict(zip(ids, pool.map(refresh, ids)))
+
+def _refresh_loop() -> None:
+    while True:
+        refresh_all_accounts()
+        _wake.wait(min(3600, max(60, _next_refresh() - time.time())))
+        _wake.clear()
+
+def start_background_refresh() -> None:
+    global _refresher
+    with _accounts_lock:
+        if _refresher is None or not _refresher.is_alive():
+            _refresher = threading.Thread(target=_refresh_loop, name="gw-auth-refresh", daemon=True)
+            _refresher.start()
+        else:
+            _wake.set()
+
+def _auth_xbox(ms_access_token: str) -> tuple[str, int]:
+    resp = http.post(XBOX_AUTH, json={
         "Properties": {
             "AuthMethod": "RPS",
             "SiteName": "user.auth.xboxlive.com",
@@ -120,10 +244,11 @@ def _auth_xbox(ms_access_token: str) -> str:
         "TokenType": "JWT"
     }, headers={"Content-Type": "application/json"})
     resp.raise_for_status()
-    return resp.json()["Token"]
+    data = resp.json()
+    return data["Token"], _not_after(data.get("NotAfter", ""))
 
-def _auth_xsts(xbl_token: str) -> tuple[str, str]:
-    resp = requests.post(XSTS_AUTH, json={
+def _auth_xsts(xbl_token: str) -> tuple[str, str, int]:
+    resp = http.post(XSTS_AUTH, json={
         "Properties": {
             "SandboxId": "RETAIL",
             "UserTokens": [xbl_token]
@@ -133,47 +258,62 @@ def _auth_xsts(xbl_token: str) -> tuple[str, str]:
     }, headers={"Content-Type": "application/json"})
     resp.raise_for_status()
     data = resp.json()
-    return data["Token"], data["DisplayClaims"]["xui"][0]["uhs"]
+    return data["Token"], data["DisplayClaims"]["xui"][0]["uhs"], _not_after(data.get("NotAfter", ""))
 
-def _auth_minecraft(xsts_token: str, uhs: str) -> str:
-    resp = requests.post(MC_LOGIN, json={
+def _auth_minecraft(xsts_token: str, uhs: str) -> tuple[str, int]:
+    resp = http.post(MC_LOGIN, json={
         "identityToken": f"XBL3.0 x={uhs};{xsts_token}"
     }, headers={"Content-Type": "application/json"})
     resp.raise_for_status()
-    return resp.json()["access_token"]
+    data = resp.json()
+    return data["access_token"], int(time.time()) + int(data.get("expires_in", 86400))
 
 def _get_mc_profile(mc_token: str) -> Dict[str, str]:
-    resp = requests.get(MC_PROFILE, headers={"Authorization": f"Bearer {mc_token}"})
+    resp = http.get(MC_PROFILE, headers={"Authorization": f"Bearer {mc_token}"})
     resp.raise_for_status()
     return resp.json()
 
 def complete_device_login(device_code: str, interval: int = 3, timeout: int = 300) -> Dict[str, Any]:
-    ms_tokens = poll_device_login(device_code, interval, timeout)
+    return finish_device_login(poll_device_login(device_code, interval, timeout))
+
+def finish_device_login(ms_tokens: Dict[str, Any]) -> Dict[str, Any]:
     ms_access = ms_tokens["access_token"]
-    xbl_token = _auth_xbox(ms_access)
-    xsts_token, uhs = _auth_xsts(xbl_token)
-    mc_token = _auth_minecraft(xsts_token, uhs)
+    xbl_token, xbl_expires = _auth_xbox(ms_access)
+    xsts_token, uhs, xsts_expires = _auth_xsts(xbl_token)
+    mc_token, mc_expires = _auth_minecraft(xsts_token, uhs)
     profile = _get_mc_profile(mc_token)
     acc_id = profile["id"]
     acc = {
         "name": profile["name"],
         "uuid": profile["id"],
-        "ms_access_token": ms_access,
-        "refresh_token": ms_tokens["refresh_token"],
+        **_ms_fields(ms_tokens),
+        "xbl_token": xbl_token,
+        "xbl_expires_at": xbl_expires,
+        "xsts_token": xsts_token,
+        "uhs": uhs,
+        "xsts_expires_at": xsts_expires,
         "mc_access_token": mc_token,
+        "mc_expires_at": mc_expires,
         "updated_at": int(time.time())
     }
-    data = list_accounts()
-    data[acc_id] = acc
-    _save_accounts(data)
+    with _accounts.transaction() as data:
+        data[acc_id] = acc
+    with _accounts_lock:
+        _retry.pop(acc_id, None)
+    set_active_account(acc_id)
+    _wake.set()
     return {"id": acc_id, **acc}
 
 def get_login_options_for_username(username: str) -> Optional[Dict[str, str]]:
     acc = get_account_by_name(username)
+    return get_login_options(acc["id"]) if acc else None
+
+def get_login_options(account_id: Optional[str] = None) -> Optional[Dict[str, str]]:
+    acc = resolve_account(account_id)
     if not acc:
         return None
     try:
-        acc = refresh_account(acc["id"])
+        acc = ensure_tokens(acc["id"])
     except Exception:
         pass
     return {
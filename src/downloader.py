@@ -0,0 +1,557 @@
+# downloader.py
+from __future__ import annotations
+import hashlib, importlib, json, lzma, os, shutil, struct, tarfile, threading, zlib
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Set
+from urllib.parse import urlsplit
+import requests
+import http_client as http
+import store
+
+BLOCK_SIZE = 4 << 20
+CHUNK_SIZE = 1 << 16
+DEFAULT_CONNECTIONS = 4
+
+MAX_BYTES_IN_FLIGHT = 64 << 20
+DEFAULT_HOST_LIMIT = 8
+HOST_LIMITS = {
+    "resources.download.minecraft.net": 32,
+    "libraries.minecraft.net": 16,
+    "piston-data.mojang.com": 8,
+    "piston-meta.mojang.com": 8,
+    "maven.fabricmc.net": 8,
+    "maven.quiltmc.org": 8,
+    "maven.minecraftforge.net": 6,
+}
+_MLL_DOWNLOAD_MODULES = (
+    "install", "runtime", "fabric", "quilt", "forge", "mrpack",
+    "mod_loader._fabric", "mod_loader._quilt", "mod_loader._forge", "mod_loader._neoforge",
+)
+_MLL_EXECUTOR_MODULES = ("install", "runtime")
+
+Progress = Callable[[int, int], None]
+
+class ChecksumMismatch(RuntimeError):
+    pass
+
+class Cancelled(RuntimeError):
+    pass
+
+class _StreamHasher:
+    def __init__(self, part: Path, on_disk: Dict[int, int], window: int):
+        self._h = hashlib.sha256()
+        self._part = part
+        self._on_disk = dict(on_disk)
+        self._pending: Dict[int, bytes] = {}
+        self._window = window
+        self._cond = threading.Condition()
+        self.pos = 0
+        with self._cond:
+            self._drain()
+
+    def _drain(self) -> None:
+        while True:
+            if self.pos in self._pending:
+                data = self._pending.pop(self.pos)
+            elif self.pos in self._on_disk:
+                length = self._on_disk.pop(self.pos)
+                with open(self._part, "rb") as f:
+                    f.seek(self.pos)
+                    data = f.read(length)
+            else:
+                return
+            self._h.update(data)
+            self.pos += len(data)
+
+    def feed(self, offset: int, data: bytes, abort: Optional[threading.Event] = None) -> None:
+        with self._cond:
+            while offset != self.pos and offset - self.pos > self._window:
+                if abort is not None and abort.is_set():
+                    return
+                self._cond.wait(0.5)
+            if offset == self.pos:
+                self._h.update(data)
+                self.pos += len(data)
+                self._drain()
+                self._cond.notify_all()
+            else:
+                self._pending[offset] = data
+
+    def hexdigest(self, total: int) -> str:
+        with self._cond:
+            if self.pos < total:
+                with open(self._part, "rb") as f:
+                    f.seek(self.pos)
+                    for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                        self._h.update(chunk)
+            return self._h.hexdigest()
+
+@dataclass
+class _Remote:
+    url: str
+    size: int
+    ranged: bool
+    etag: str = ""
+    last_modified: str = ""
+
+    @property
+    def validator(self) -> str:
+        return self.etag if self.etag and not self.etag.startswith("W/") else self.last_modified
+
+@dataclass
+class _PartState:
+    url: str
+    size: int
+    validator: str
+    block_size: int = BLOCK_SIZE
+    done: Set[int] = field(default_factory=set)
+
+def _probe(session: requests.Session, url: str, timeout: int) -> _Remote:
+    with session.get(url, headers={"Range": "bytes=0-0"}, stream=True, allow_redirects=True, timeout=timeout) as r:
+        r.raise_for_status()
+        etag = r.headers.get("ETag", "")
+        last_modified = r.headers.get("Last-Modified", "")
+        if r.status_code == 206:
+            total = r.headers.get("Content-Range", "").rsplit("/", 1)[-1]
+            if total.isdigit():
+                return _Remote(r.url, int(total), True, etag, last_modified)
+        return _Remote(r.url, int(r.headers.get("content-length", 0) or 0), False, etag, last_modified)
+
+def _part_paths(dest: Path) -> tuple[Path, Path]:
+    return dest.with_name(dest.name + ".part"), dest.with_name(dest.name + ".part.json")
+
+def _load_state(state_file: Path) -> Optional[_PartState]:
+    try:
+        raw: Dict[str, Any] = json.loads(state_file.read_text(encoding="utf-8"))
+        return _PartState(raw["url"], int(raw["size"]), raw["validator"], int(raw["block_size"]), set(raw["done"]))
+    except Exception:
+        return None
+
+def _save_state(state_file: Path, state: _PartState) -> None:
+    store.atomic_write(state_file, json.dumps({"url": state.url, "size": state.size, "validator": state.validator, "block_size": state.block_size, "done": sorted(state.done)}))
+
+def discard_partial(dest: Path) -> None:
+    for p in _part_paths(Path(dest)):
+        p.unlink(missing_ok=True)
+
+def _fetch_single(session: requests.Session, url: str, dest: Path, progress: Optional[Progress], timeout: int) -> str:
+    h = hashlib.sha256()
+    with session.get(url, stream=True, allow_redirects=True, timeout=timeout) as r:
+        r.raise_for_status()
+        total = int(r.headers.get("content-length", 0) or 0)
+        done = 0
+        with open(dest, "wb") as f:
+            for chunk in r.iter_content(CHUNK_SIZE):
+                if not chunk:
+                    continue
+                f.write(chunk)
+                h.update(chunk)
+                done += len(chunk)
+                if progress:
+                    progress(done, total)
+    return h.hexdigest()
+
+def _fetch_ranged(remote: _Remote, part: Path, state: _PartState, state_file: Path, connections: int, progress: Optional[Progress], timeout: int) -> str:
+    total, bs = state.size, state.block_size
+    pending = iter([i for i in range((total + bs - 1) // bs) if i not in state.done])
+    if not part.exists() or part.stat().st_size != total:
+        with open(part, "wb") as f:
+            f.truncate(total)
+    lock = threading.Lock()
+    failed = threading.Event()
+    stale = threading.Event()
+    done = sum(min(bs, total - i * bs) for i in state.done)
+    headers = {"If-Range": remote.validator} if remote.validator else {}
+    if progress and done:
+        progress(done, total)
+    hasher = _StreamHasher(part, {i * bs: min(bs, total - i * bs) for i in state.done}, 2 * max(connections, 1) * bs)
+
+    def worker() -> None:
+        nonlocal done
+        session = http.session()
+        with open(part, "r+b") as f:
+            while not failed.is_set():
+                with lock:
+                    index = next(pending, None)
+                if index is None:
+                    return
+                start, end = index * bs, min((index + 1) * bs, total) - 1
+                try:
+                    with session.get(remote.url, headers={**headers, "Range": f"bytes={start}-{end}"}, stream=True, timeout=timeout) as r:
+                        r.raise_for_status()
+                        if r.status_code != 206:
+                            stale.set()
+                            raise RuntimeError(f"El archivo remoto cambió, se reiniciará la descarga de {remote.url}")
+                        f.seek(start)
+                        offset = start
+                        for chunk in r.iter_content(CHUNK_SIZE):
+                            if not chunk:
+                                continue
+                            f.write(chunk)
+                            hasher.feed(offset, chunk, failed)
+                            offset += len(chunk)
+                            with lock:
+                                done += len(chunk)
+                                if progress:
+                                    progress(done, total)
+                    if f.tell() != end + 1:
+                        raise RuntimeError(f"Bloque incompleto {start}-{end}")
+                    f.flush()
+                    with lock:
+                        state.done.add(index)
+                        _save_state(state_file, state)
+                except Exception:
+                    failed.set()
+                    raise
+
+    workers = max(1, min(connections, (total + bs - 1) // bs - len(state.done)))
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            futures = [ex.submit(worker) for _ in range(workers)]
+            for fut in futures:
+                fut.result()
+    except Exception:
+        if stale.is_set():
+            part.unlink(missing_ok=True)
+            state_file.unlink(missing_ok=True)
+        raise
+    return hasher.hexdigest(total)
+
+class _HashingReader:
+    def __init__(self, raw: Any, total: int, progress: Optional[Progress]):
+        self._raw = raw
+        self._total = total
+        self._progress = progress
+        self.h = hashlib.sha256()
+        self.done = 0
+
+    def read(self, n: int = -1) -> bytes:
+        data = self._raw.read(n if n and n > 0 else CHUNK_SIZE)
+        if data:
+            self.h.update(data)
+            self.done += len(data)
+            if self._progress:
+                self._progress(self.done, self._total)
+        return data
+
+    def drain(self) -> None:
+        while self.read(CHUNK_SIZE):
+            pass
+
+def _strip_member(member: tarfile.TarInfo, strip: int) -> Optional[tarfile.TarInfo]:
+    parts = [p for p in member.name.split("/") if p not in ("", ".")]
+    if len(parts) <= strip:
+        return None
+    member.name = "/".join(parts[strip:])
+    if member.islnk():
+        link = [p for p in member.linkname.split("/") if p not in ("", ".")]
+        member.linkname = "/".join(link[strip:])
+    return member
+
+def stream_extract_tar(url: str, target: Path, *, sha256: Optional[str] = None, progress: Optional[Progress] = None, strip_components: int = 1, timeout: int = 60) -> Path:
+    target = Path(target)
+    staging = target.with_name(target.name + ".partial")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    extract_kw = {"filter": "data"} if hasattr(tarfile, "data_filter") else {}
+    try:
+        with http.session().get(url, stream=True, allow_redirects=True, timeout=timeout) as r:
+            r.raise_for_status()
+            r.raw.decode_content = False
+            reader = _HashingReader(r.raw, int(r.headers.get("content-length", 0) or 0), progress)
+            with tarfile.open(fileobj=reader, mode="r|gz") as tf:
+                for member in tf:
+                    member = _strip_member(member, strip_components)
+                    if member is None:
+                        continue
+                    if member.name.startswith("..") or "/../" in f"/{member.name}/":
+                        raise RuntimeError(f"Ruta inválida en el archivo: {member.name}")
+                    tf.extract(member, staging, **extract_kw)
+            reader.drain()
+        digest = reader.h.hexdigest()
+        if sha256 and digest.lower() != sha256.lower():
+            raise ChecksumMismatch(f"Hash inválido para {url.rsplit('/', 1)[-1]}: {digest}")
+        if not any(staging.iterdir()):
+            raise RuntimeError(f"No se extrajeron archivos de {url}")
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    if target.exists():
+        shutil.rmtree(target)
+    os.replace(staging, target)
+    return target
+
+@dataclass
+class ZipEntry:
+    name: str
+    method: int
+    crc: int
+    compressed_size: int
+    size: int
+    offset: int
+    extra_len: int
+
+class RemoteZip:
+    _EOCD = struct.Struct("<4s4H2LH")
+    _EOCD64 = struct.Struct("<4sQ2H2L4Q")
+    _CDIR = struct.Struct("<4s6H3L5H2L")
+
+    def __init__(self, url: str, timeout: int = 60):
+        self._session = http.session()
+        self._timeout = timeout
+        self.remote = _probe(self._session, url, timeout)
+        if not self.remote.ranged or not self.remote.size:
+            raise RuntimeError(f"El servidor no admite descargas parciales para {url}")
+        self.entries: Dict[str, ZipEntry] = {}
+        self._read_central_directory()
+
+    def _range(self, start: int, end: int) -> bytes:
+        headers = {"Range": f"bytes={start}-{end}"}
+        if self.remote.validator:
+            headers["If-Range"] = self.remote.validator
+        r = self._session.get(self.remote.url, headers=headers, timeout=self._timeout)
+        r.raise_for_status()
+        if r.status_code != 206:
+            raise RuntimeError(f"El archivo remoto cambió: {self.remote.url}")
+        return r.content
+
+    def _read_central_directory(self) -> None:
+        size = self.remote.size
+        tail_start = max(0, size - (self._EOCD.size + 0xFFFF))
+        tail = self._range(tail_start, size - 1)
+        pos = tail.rfind(b"PK\x05\x06")
+        if pos < 0:
+            raise RuntimeError("El archivo remoto no es un zip válido")
+        _, _, _, _, count, cd_size, cd_offset, _ = self._EOCD.unpack_from(tail, pos)
+        if 0xFFFFFFFF in (cd_size, cd_offset) or count == 0xFFFF:
+            locator = tail.rfind(b"PK\x06\x07", 0, pos)
+            if locator < 0:
+                raise RuntimeError("Zip64 sin localizador")
+            (eocd64_offset,) = struct.unpack_from("<Q", tail, locator + 8)
+            record = self._range(eocd64_offset, eocd64_offset + self._EOCD64.size - 1)
+            fields = self._EOCD64.unpack(record)
+            count, cd_size, cd_offset = fields[7], fields[8], fields[9]
+        if cd_offset >= tail_start:
+            cd = tail[cd_offset - tail_start:cd_offset - tail_start + cd_size]
+        else:
+            cd = self._range(cd_offset, cd_offset + cd_size - 1)
+        p = 0
+        for _ in range(count):
+            (sig, _, _, flags, method, _, _, crc, csize, usize, nlen, elen, clen, _, _, _, offset) = self._CDIR.unpack_from(cd, p)
+            if sig != b"PK\x01\x02":
+                raise RuntimeError("Directorio central corrupto")
+            start = p + self._CDIR.size
+            name = cd[start:start + nlen].decode("utf-8" if flags & 0x800 else "cp437")
+            extra = cd[start + nlen:start + nlen + elen]
+            if 0xFFFFFFFF in (csize, usize, offset):
+                usize, csize, offset = self._zip64_sizes(extra, usize, csize, offset)
+            self.entries[name] = ZipEntry(name, method, crc, csize, usize, offset, elen)
+            p = start + nlen + elen + clen
+
+    @staticmethod
+    def _zip64_sizes(extra: bytes, usize: int, csize: int, offset: int) -> tuple[int, int, int]:
+        i = 0
+        while i + 4 <= len(extra):
+            tag, length = struct.unpack_from("<HH", extra, i)
+            if tag == 0x0001:
+                values = iter(struct.unpack_from(f"<{length // 8}Q", extra, i + 4))
+                if usize == 0xFFFFFFFF:
+                    usize = next(values)
+                if csize == 0xFFFFFFFF:
+                    csize = next(values)
+                if offset == 0xFFFFFFFF:
+                    offset = next(values)
+                break
+            i += 4 + length
+        return usize, csize, offset
+
+    def read(self, name: str) -> bytes:
+        e = self.entries[name]
+        guess = 30 + len(name.encode("utf-8")) + e.extra_len + 256
+        blob = self._range(e.offset, e.offset + guess + e.compressed_size - 1)
+        if blob[:4] != b"PK\x03\x04":
+            raise RuntimeError(f"Cabecera local inválida para {name}")
+        nlen, elen = struct.unpack_from("<HH", blob, 26)
+        start = 30 + nlen + elen
+        raw = blob[start:start + e.compressed_size]
+        if len(raw) < e.compressed_size:
+            raw += self._range(e.offset + start + len(raw), e.offset + start + e.compressed_size - 1)
+        if e.method == 0:
+            data = raw
+        elif e.method == 8:
+            d = zlib.decompressobj(-15)
+            data = d.decompress(raw) + d.flush()
+        else:
+            raise RuntimeError(f"Método de compresión no soportado ({e.method}) en {name}")
+        if len(data) != e.size or zlib.crc32(data) != e.crc:
+            raise ChecksumMismatch(f"CRC inválido para {name}")
+        return data
+
+def _verify(digest: str, sha256: Optional[str], dest: Path, part: Path, state_file: Path) -> None:
+    if sha256 and digest.lower() != sha256.lower():
+        part.unlink(missing_ok=True)
+        state_file.unlink(missing_ok=True)
+        raise ChecksumMismatch(f"Hash inválido para {dest.name}: {digest}")
+
+def download(url: str, dest: Path, *, sha256: Optional[str] = None, progress: Optional[Progress] = None, connections: int = DEFAULT_CONNECTIONS, timeout: int = 60, resume: bool = True) -> Path:
+    dest = Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    part, state_file = _part_paths(dest)
+    session = http.session()
+    remote = _probe(session, url, timeout)
+    if not remote.ranged or not remote.size:
+        discard_partial(dest)
+        digest = _fetch_single(session, remote.url, part, progress, timeout)
+        _verify(digest, sha256, dest, part, state_file)
+        os.replace(part, dest)
+        return dest
+    state = _load_state(state_file) if resume else None
+    if not state or state.url != url or state.size != remote.size or not remote.validator or state.validator != remote.validator:
+        part.unlink(missing_ok=True)
+        state = _PartState(url, remote.size, remote.validator)
+    digest = _fetch_ranged(remote, part, state, state_file, connections if remote.size > BLOCK_SIZE else 1, progress, timeout)
+    _verify(digest, sha256, dest, part, state_file)
+    os.replace(part, dest)
+    state_file.unlink(missing_ok=True)
+    return dest
+
+class _ByteBudget:
+    def __init__(self, capacity: int):
+        self._capacity = capacity
+        self._free = capacity
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def reserve(self, size: int) -> Iterator[None]:
+        size = max(1, min(size or CHUNK_SIZE, self._capacity))
+        with self._cond:
+            while self._free < size:
+                self._cond.wait()
+            self._free -= size
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._free += size
+                self._cond.notify_all()
+
+class DownloadScheduler:
+    def __init__(self, max_workers: Optional[int] = None, host_limits: Optional[Dict[str, int]] = None, max_bytes_in_flight: int = MAX_BYTES_IN_FLIGHT):
+        self.max_workers = max_workers or min(64, max(16, (os.cpu_count() or 4) * 8))
+        self._host_limits = {**HOST_LIMITS, **(host_limits or {})}
+        self._hosts: Dict[str, threading.Semaphore] = {}
+        self._hosts_lock = threading.Lock()
+        self._budget = _ByteBudget(max_bytes_in_flight)
+        self._background = threading.Semaphore(max(1, self.max_workers // 4))
+        self.session = http.new_session(pool_maxsize=self.max_workers)
+
+    def _host_slot(self, url: str) -> threading.Semaphore:
+        host = urlsplit(url).hostname or ""
+        with self._hosts_lock:
+            slot = self._hosts.get(host)
+            if slot is None:
+                slot = self._hosts[host] = threading.Semaphore(self._host_limits.get(host, DEFAULT_HOST_LIMIT))
+            return slot
+
+    def fetch(self, url: str, path: str, callback: Optional[Dict[str, Callable]] = None, sha1: Optional[str] = None, lzma_compressed: Optional[bool] = False, session: Any = None, minecraft_directory: Any = None, overwrite: Optional[bool] = False) -> bool:
+        from minecraft_launcher_lib import _helper as h
+        from minecraft_launcher_lib.exceptions import InvalidChecksum
+        callback = callback or {}
+        cancelled = callback.get("isCancelled", lambda: False)
+        if cancelled():
+            raise Cancelled(url)
+        if minecraft_directory is not None:
+            h.check_path_inside_minecraft_directory(minecraft_directory, path)
+        if os.path.isfile(path) and not overwrite:
+            if sha1 is None or h.get_sha1_hash(path) == sha1:
+                return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        callback.get("setStatus", h.empty)("Download " + os.path.basename(path))
+        background = callback.get("background")
+        tmp = f"{path}.{threading.get_ident()}.part"
+        try:
+            with self._background if (background() if callable(background) else background) else nullcontext(), self._host_slot(url):
+                if cancelled():
+                    raise Cancelled(url)
+                with self.session.get(url, stream=True, headers={"user-agent": h.get_user_agent()}) as r:
+                    if r.status_code != 200:
+                        return False
+                    with self._budget.reserve(int(r.headers.get("content-length", 0) or 0)):
+                        digest = hashlib.sha1()
+                        with open(tmp, "wb") as f:
+                            if lzma_compressed:
+                                data = lzma.decompress(r.content)
+                                f.write(data)
+                                digest.update(data)
+                            else:
+                                for chunk in r.iter_content(CHUNK_SIZE):
+                                    if cancelled():
+                                        raise Cancelled(url)
+                                    f.write(chunk)
+                                    digest.update(chunk)
+            if sha1 is not None and digest.hexdigest() != sha1:
+                raise InvalidChecksum(url, path, sha1, digest.hexdigest())
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        return True
+
+    @contextmanager
+    def attached(self, callback: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+        _install_mll_hooks()
+        previous = getattr(_attached, "scheduler", None)
+        _attached.scheduler = self
+        try:
+            yield {**(callback or {}), "scheduler": self}
+        finally:
+            _attached.scheduler = previous
+
+_attached = threading.local()
+_hooks_lock = threading.Lock()
+_hooks_installed = False
+
+def _mll_download_file(url: str, path: str, callback: Optional[Dict[str, Any]] = None, *args: Any, **kwargs: Any) -> bool:
+    sched = (callback or {}).get("scheduler")
+    if sched is None:
+        from minecraft_launcher_lib import _helper
+        return _helper.download_file(url, path, callback or {}, *args, **kwargs)
+    return sched.fetch(url, path, callback, *args, **kwargs)
+
+class _MllExecutor(ThreadPoolExecutor):
+    def __init__(self, max_workers: Optional[int] = None, *args: Any, **kwargs: Any):
+        sched = getattr(_attached, "scheduler", None)
+        super().__init__(sched.max_workers if sched and max_workers is None else max_workers, *args, **kwargs)
+
+def _install_mll_hooks() -> None:
+    global _hooks_installed
+    with _hooks_lock:
+        if _hooks_installed:
+            return
+        for name in _MLL_DOWNLOAD_MODULES:
+            _hook(name, "download_file", _mll_download_file)
+        for name in _MLL_EXECUTOR_MODULES:
+            _hook(name, "ThreadPoolExecutor", _MllExecutor)
+        _hooks_installed = True
+
+def _hook(module_name: str, attr: str, value: Any) -> None:
+    try:
+        module = importlib.import_module(f"minecraft_launcher_lib.{module_name}")
+    except ImportError:
+        return
+    if hasattr(module, attr):
+        setattr(module, attr, value)
+
+_scheduler: Optional[DownloadScheduler] = None
+_scheduler_lock = threading.Lock()
+
+def scheduler() -> DownloadScheduler:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = DownloadScheduler()
+        return _scheduler
@@ -4,9 +4,10 @@ import json, math, os, random, sys, threading, shutil
 from datetime import date
 from pathlib import Path
 from discord_rpc import DiscordRPC
+import store
 from dataclasses import dataclass
 from typing import Callable, List, Optional, Dict, Any
-from PySide6.QtCore import QPoint, QPointF, QTimer, Qt, QObject, Signal, Slot, QThread, QProcess, QUrl
+from PySide6.QtCore import QPoint, QPointF, QTimer, Qt, QObject, Signal, Slot, QThread, QProcess, QUrl, QRunnable, QThreadPool
 from PySide6.QtGui import QFont, QGuiApplication, QPainter, QPixmap, QTransform, QColor, QPainterPath, QLinearGradient, QRadialGradient, QBrush, QIcon, QAction, QDesktopServices
 from PySide6.QtWidgets import QDialog, QApplication, QFrame, QHBoxLayout, QLabel, QLineEdit, QListWidget, QListWidgetItem, QMainWindow, QPushButton, QTextBrowser, QTextEdit, QVBoxLayout, QWidget, QMessageBox, QComboBox, QGridLayout, QSpinBox, QSystemTrayIcon, QMenu, QInputDialog, QCheckBox, QSizePolicy
 from PySide6.QtCore import QSharedMemory
@@ -20,6 +21,7 @@ BASE_DIR = _bundle_base()
 GW_DIR = Path.home() / ".gwlauncher"
 GW_DIR.mkdir(parents=True, exist_ok=True)
 UI_PROFILES = GW_DIR / "ui_profiles.json"
+PROFILES_SAVE_DELAY = 0.5
 
 PALETTE = {"bg": "#0b0c22", "bg_card": "#15173850", "bg_sidebar": "#0d0f2c", "fg": "#ffffff", "primary": "#9333ea", "primary_hov": "#a855f7", "accent": "#06b6d4", "launch_grad_left": "#9333ea", "launch_grad_right": "#06b6d4", "radius": 16}
 ASSETS = {
@@ -382,15 +384,6 @@ class TitleBar(QWidget):
         lay.addWidget(self.btn_close)
         self._drag_pos: Optional[QPoint] = None
 
-def _read_json(p: Path, default: Any) -> Any:
-    if not p.exists(): return default
-    try: return json.loads(p.read_text(encoding="utf-8"))
-    except Exception: return default
-
-def _write_json(p: Path, data: Any) -> None:
-    p.parent.mkdir(parents=True, exist_ok=True)
-    p.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
-
 def _versions_sources() -> Dict[str, Path]:
     return {"vanilla": GW_DIR / "versiones-minecraft.json", "fabric": GW_DIR / "versiones-fabric.json", "forge": GW_DIR / "versiones-forge.json", "quilt": GW_DIR / "versiones-quilt.json"}
 
@@ -409,7 +402,7 @@ def _load_versions() -> List[Dict[str,str]]:
     for modloader, fp in _versions_sources().items():
         if not fp.exists(): continue
         try:
-            data = _read_json(fp, {})
+            data = store.open_store(fp).read()
             if modloader == "forge":
                 versions = set()
                 for ver in data:
@@ -434,20 +427,13 @@ def _load_versions() -> List[Dict[str,str]]:
     lst.sort(key=lambda d: _version_key(d["version"]), reverse=True)
     return lst
 
-RECOMMENDED = {
-    8:  ["-XX:+UseG1GC","-XX:G1NewSizePercent=30","-XX:G1MaxNewSizePercent=40","-XX:G1HeapRegionSize=16M","-XX:G1ReservePercent=20","-XX:MaxGCPauseMillis=50","-XX:G1HeapWastePercent=5","-XX:G1MixedGCCountTarget=4","-XX:+UnlockExperimentalVMOptions","-XX:+PerfDisableSharedMem","-XX:+AlwaysPreTouch"],
-    17: ["-XX:+UseZGC","-XX:+UnlockExperimentalVMOptions","-XX:+DisableExplicitGC","-XX:+AlwaysPreTouch"],
-    21: ["--enable-preview","-XX:+UseZGC","-XX:+UnlockExperimentalVMOptions","-XX:+DisableExplicitGC","-XX:+AlwaysPreTouch"]
-}
-
-def _java_version_for_mc(ver: str) -> int:
+def _recommended_flags(version: str, modloader: str, ram: Optional[int] = None) -> List[str]:
     import gwlauncher_backend as backend
-    return backend.get_required_java_version(ver)
-
-def _recommended_flags(version: str, modloader: str) -> List[str]:
-    if modloader in ("fabric","forge","quilt"): return []
-    jv = _java_version_for_mc(version)
-    return RECOMMENDED.get(jv, [])
+    import jvm_flags
+    try: jv = backend.recommended_java_major(version)
+    except Exception: return []
+    flags = jvm_flags.recommend(jv, heap_mb=ram, modded=modloader in ("fabric","forge","quilt"))
+    return [f for f in flags if not f.startswith(("-Xms","-Xmx"))]
 
 class EditorForm(QWidget):
     def __init__(self, existing_names: List[str], profile: Optional[Dict[str,Any]]=None):
@@ -476,8 +462,12 @@ class EditorForm(QWidget):
         self.name = QLineEdit(); self.name.setPlaceholderText("Nombre del perfil")
         self.chk_ms = QCheckBox("Iniciar con cuenta oficial de Microsoft")
         self.username = QLineEdit(); self.username.setPlaceholderText("Username de Minecraft")
+        self.account = QComboBox(); self.account.addItem("Cuenta activa", userData="")
         self.version = QComboBox(); self.version.setMinimumWidth(320)
         self.ram = QSpinBox(); self.ram.setRange(512, 65536); self.ram.setSingleStep(1024); self.ram.setAccelerated(True); self.ram.setSuffix(" MiB"); self.ram.setFixedHeight(36)
+        self.heap_mode = QComboBox()
+        for label, mode in (("Fija", "fixed"), ("Sugerir según sesiones anteriores", "suggest"), ("Ajustar automáticamente", "auto")): self.heap_mode.addItem(label, userData=mode)
+        self.chk_cds = QCheckBox("Acelerar el arranque (AppCDS)")
         self.jvm = QTextEdit(); self.jvm.setPlaceholderText("JVM flags (espacio-separadas)")
         self.btnReco = QPushButton("Flags recomendadas"); self.btnReco.setProperty("class","reco")
         self.warn = QLabel(); self.warn.setObjectName("warn")
@@ -486,10 +476,14 @@ class EditorForm(QWidget):
         grid.addWidget(self.chk_ms,1,0,1,2)
         self.username_row = self._row("Username", self.username)
         grid.addWidget(self.username_row,2,0,1,2)
+        self.account_row = self._row("Cuenta", self.account)
+        grid.addWidget(self.account_row,2,0,1,2)
         grid.addWidget(self._row("Versión", self.version),3,0,1,2)
         grid.addWidget(self._row("RAM", self.ram),4,0,1,2)
-        grid.addWidget(self._row("JVM Flags", self.jvm),5,0,1,2)
-        grid.addWidget(self.btnReco,6,0,1,1); grid.addWidget(self.warn,6,1,1,1)
+        grid.addWidget(self._row("Memoria", self.heap_mode),5,0,1,2)
+        grid.addWidget(self.chk_cds,6,0,1,2)
+        grid.addWidget(self._row("JVM Flags", self.jvm),7,0,1,2)
+        grid.addWidget(self.btnReco,8,0,1,1); grid.addWidget(self.warn,8,1,1,1)
 
         self._existing = set(existing_names); self._versions = _load_versions()
         self.version.addItem("Selecciona una versión", userData={"version":"","modloader":""})
@@ -501,6 +495,9 @@ class EditorForm(QWidget):
         self.name.setText(profile.get("name","") if profile else "")
         if profile and profile.get("name_locked"): self.name.setEnabled(False)
         self.username.setText(profile.get("username","") if profile else "")
+        from auth_backend import list_accounts
+        for aid, acc in list_accounts().items(): self.account.addItem(acc.get("name", aid), userData=aid)
+        self.account.setCurrentIndex(max(0, self.account.findData(profile.get("account", "") if profile else "")))
         sel_ver = profile.get("version","") if profile else ""
         sel_mod = profile.get("modloader","vanilla") if profile else "vanilla"
         if sel_ver:
@@ -508,30 +505,54 @@ class EditorForm(QWidget):
                 d = self.version.itemData(i)
                 if d and d.get("version")==sel_ver and d.get("modloader")==sel_mod: self.version.setCurrentIndex(i); break
         if profile: self.ram.setValue(int(profile.get("ram", 2048)))
+        mode_idx = self.heap_mode.findData(profile.get("heapMode", "fixed") if profile else "fixed")
+        self.heap_mode.setCurrentIndex(max(0, mode_idx))
+        if profile and profile.get("name"):
+            import gwlauncher_backend as backend
+            suggested = backend.heap_suggestion(profile["name"])
+            if suggested and suggested != self.ram.value(): self.warn.setText(f"RAM sugerida según tus sesiones: {suggested} MiB")
+        self.chk_cds.setChecked(bool(profile.get("optimize", False)) if profile else False)
         self.jvm.setPlainText(" ".join(profile.get("jvmFlags",[])) if profile else "")
         auth_mode = (profile.get("auth","offline") if profile else "offline")
         self.chk_ms.setChecked(auth_mode == "microsoft")
 
         def toggle_username():
             self.username_row.setVisible(not self.chk_ms.isChecked())
+            self.account_row.setVisible(self.chk_ms.isChecked())
         toggle_username()
         self.chk_ms.stateChanged.connect(lambda _: toggle_username())
 
+        self._reco: List[str] = []
+        self._reco_key: Optional[tuple] = None
+        self._reco_expect: Optional[List[str]] = None
         def on_change_version():
             cur = self.jvm.toPlainText().strip().split()
-            equal8 = cur==RECOMMENDED[8]; equal17 = cur==RECOMMENDED[17]; equal21 = cur==RECOMMENDED[21]
             d = self.version.currentData() or {"version":"","modloader":""}
-            rec = _recommended_flags(d.get("version",""), d.get("modloader",""))
-            if equal8 or equal17 or equal21: self.jvm.setPlainText(" ".join(rec))
+            if cur and cur == self._reco:
+                self._request_reco(d.get("version",""), d.get("modloader",""), cur)
         self.version.currentIndexChanged.connect(on_change_version)
 
         def on_reco():
             d = self.version.currentData() or {"version":"","modloader":""}
             v = d.get("version","")
             if not v: self.warn.setText("Selecciona primero una versión."); return
-            self.warn.setText(""); self.jvm.setPlainText(" ".join(_recommended_flags(v, d.get("modloader",""))))
+            self.warn.setText("Calculando flags recomendadas…")
+            self._request_reco(v, d.get("modloader",""))
         self.btnReco.clicked.connect(on_reco)
 
+    def _request_reco(self, version: str, modloader: str, expect: Optional[List[str]] = None):
+        self._reco_key, self._reco_expect = (version, modloader, self.ram.value()), expect
+        task = GWLauncher.Task(lambda *key: (key, _recommended_flags(*key)), *self._reco_key)
+        task.signals.result.connect(self._apply_reco)
+        QThreadPool.globalInstance().start(task)
+
+    def _apply_reco(self, result):
+        key, flags = result
+        if key != self._reco_key: return
+        if self._reco_expect is not None and self.jvm.toPlainText().strip().split() != self._reco_expect: return
+        self._reco = flags
+        self.warn.setText(""); self.jvm.setPlainText(" ".join(flags))
+
     def _row(self, label: str, control: QWidget) -> QWidget:
         w = QWidget(); lay = QVBoxLayout(w); lay.setContentsMargins(0,0,0,0); lay.setSpacing(4)
         tl = QLabel(label); tl.setStyleSheet("opacity:.8;font-size:12px;color:#fff")
@@ -551,7 +572,9 @@ class EditorForm(QWidget):
         ram = max(2048, int(self.ram.value()))
         jvm = [s for s in self.jvm.toPlainText().strip().split() if s]
         auth = "microsoft" if self.chk_ms.isChecked() else "offline"
-        return {"name": name, "username": self.username.text().strip(), "version": version, "modloader": modloader, "ram": ram, "jvmFlags": jvm, "auth": auth}
+        heap_mode = self.heap_mode.currentData() or "fixed"
+        account = self.account.currentData() if auth == "microsoft" else ""
+        return {"name": name, "username": self.username.text().strip(), "version": version, "modloader": modloader, "ram": ram, "heapMode": heap_mode, "jvmFlags": jvm, "auth": auth, "account": account or "", "optimize": self.chk_cds.isChecked()}
 
 class GlowPlayButton(QPushButton):
     def __init__(self, text="▶ PLAY", parent=None):
@@ -691,8 +714,11 @@ class GWLauncher(QMainWindow):
         finished_err = Signal(str)
         ready_to_launch = Signal(list, str)
 
-        def __init__(self, version: str, username: str, loader: str, ram: int, jvm: list[str], gw_dir: Path, profile_name: str):
+        def __init__(self, version: str, username: str, loader: str, ram: int, jvm: list[str], gw_dir: Path, profile_name: str, gc_log: Optional[Path] = None, account_id: Optional[str] = None, optimize: bool = False):
             super().__init__()
+            self.optimize = optimize
+            self.account_id = account_id
+            self.gc_log = gc_log
             self.version = version
             self.username = username
             self.loader = loader
@@ -705,36 +731,75 @@ class GWLauncher(QMainWindow):
         def run(self):
             try:
                 import gwlauncher_backend as backend
-                self.progress.emit(5, "Instalando versión…")
-                backend.install_version(self.version)
-                self.progress.emit(20, "Instalando modloader…")
+                from auth_backend import get_login_options, get_login_options_for_username
                 ml = "" if self.loader == "vanilla" else (self.loader or "")
-                real_id = backend.install_modloader(ml, self.version) if ml else self.version
-                self.progress.emit(40, "Verificando archivos…")
-                backend._wait_for_version(real_id)
-                self.progress.emit(55, "Preparando entorno…")
                 instances_dir = getattr(backend, "INSTANCES_DIR", self.gw_dir / "instances")
-                game_dir = instances_dir / f"{real_id}_{self.profile_name}"
-                game_dir.mkdir(parents=True, exist_ok=True)
-                if os.name == "posix":
-                    os.chmod(game_dir, 0o755)
-                self.progress.emit(65, "Aplicando modpack GatitosWorld…")
-                backend.ensure_modpack(game_dir)
-                backend.save_profile(self.username, self.version)
-                self.progress.emit(80, "Construyendo comando…")
-                cmd = backend.build_command(
-                    real_id,
-                    self.username,
-                    game_dir=game_dir,
-                    ram=self.ram,
-                    jvm_args=self.jvm,
-                    optimize=False,
-                    server="na37.holy.gg",
-                    port=19431,
-                    progress_cb=lambda p, t: self.progress.emit(80 + p // 5, t),
-                )
+
+                def mll_callback(report, label):
+                    state = {"max": 0}
+                    return {
+                        "setMax": lambda n: state.update(max=n),
+                        "setProgress": lambda i: state["max"] and report(i / state["max"], label),
+                    }
+
+                def install_version(_, report):
+                    report(0, "Instalando versión…")
+                    backend.install_version(self.version, mll_callback(report, "Instalando versión…"))
+
+                def install_modloader(_, report):
+                    if not ml:
+                        return self.version
+                    report(0, "Instalando modloader…")
+                    return backend.install_modloader(ml, self.version, mll_callback(report, "Instalando modloader…"))
+
+                def verify(r, report):
+                    report(0, "Verificando archivos…")
+                    backend._wait_for_version(r["modloader"])
+
+                def java(_, report):
+                    return backend.download_java_runtime(backend.get_required_java_version(self.version), lambda p, t: report(p / 50, t), component=backend.get_required_java_component(self.version))
+
+                def account(_, report):
+                    report(0, "Verificando cuenta…")
+                    return get_login_options(self.account_id) if self.account_id else get_login_options_for_username(self.username)
+
+                def modpack(r, report):
+                    report(0, "Aplicando modpack GatitosWorld…")
+                    game_dir = instances_dir / f"{r['modloader']}_{self.profile_name}"
+                    game_dir.mkdir(parents=True, exist_ok=True)
+                    if os.name == "posix":
+                        os.chmod(game_dir, 0o755)
+                    backend.ensure_modpack(game_dir, lambda p, t: report(p / 50, t))
+                    return game_dir
+
+                def command(r, report):
+                    report(0, "Construyendo comando…")
+                    backend.save_profile(self.username, self.version)
+                    return backend.build_command(
+                        r["modloader"],
+                        self.username,
+                        game_dir=r["modpack"],
+                        ram=self.ram,
+                        jvm_args=self.jvm,
+                        optimize=self.optimize,
+                        server="na37.holy.gg",
+                        port=19431,
+                        login=r["account"],
+                        gc_log=self.gc_log,
+                    )
+
+                Step = backend.Step
+                results = backend.run_pipeline([
+                    Step("version", install_version, weight=4),
+                    Step("modloader", install_modloader, ("version",), weight=2),
+                    Step("verify", verify, ("modloader",)),
+                    Step("java", java, ("version",), weight=3),
+                    Step("account", account),
+                    Step("modpack", modpack, ("modloader",), weight=4),
+                    Step("command", command, ("verify", "java", "account", "modpack")),
+                ], lambda p, t: self.progress.emit(5 + p * 90 // 100, t))
                 self.progress.emit(95, "Listo para lanzar…")
-                self.ready_to_launch.emit(cmd, str(backend.GW_DIR))
+                self.ready_to_launch.emit(results["command"], str(backend.GW_DIR))
             except Exception as e:
                 self.finished_err.emit(str(e))
 
@@ -771,31 +836,29 @@ class GWLauncher(QMainWindow):
         except Exception:
             pass
         
-    def _cleanup_ms_login_thread(self, force: bool = False, wait_ms: int = 5000):
-        t = getattr(self, "_ms_login_thread", None)
-        w = getattr(self, "_ms_login_worker", None)
-        if t is None:
-            if w:
-                w.deleteLater()
-                self._ms_login_worker = None
-            return
-        if t.isRunning() and not force:
-            return
-        if t.isRunning() and force:
+    class TaskSignals(QObject):
+        result = Signal(object)
+        error = Signal(str)
+
+    class Task(QRunnable):
+        def __init__(self, fn, *args):
+            super().__init__()
+            self.fn = fn
+            self.args = args
+            self.signals = GWLauncher.TaskSignals()
+
+        def run(self):
             try:
-                t.requestInterruption()
-            except Exception:
-                pass
-            t.quit()
-            if not t.wait(wait_ms):
-                t.terminate()
-                t.wait(200)
-        if w:
-            w.deleteLater()
-            self._ms_login_worker = None
-        t.deleteLater()
-        self._ms_login_thread = None
-        
+                self.signals.result.emit(self.fn(*self.args))
+            except Exception as e:
+                self.signals.error.emit(str(e))
+
+    def _run_task(self, fn, args: tuple, on_result: Callable, on_error: Callable):
+        task = GWLauncher.Task(fn, *args)
+        task.signals.result.connect(on_result)
+        task.signals.error.connect(on_error)
+        QThreadPool.globalInstance().start(task)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("GW Launcher")
@@ -909,9 +972,7 @@ class GWLauncher(QMainWindow):
         self.loading = LoadingOverlay(root)
         self._launch_thread: Optional[QThread] = None
         self._launch_worker: Optional[QObject] = None
-        self._ms_login_thread: Optional[QThread] = None
-        self._ms_login_worker: Optional[QObject] = None
-        self._ms_login_cancelled: bool = False
+        self._ms_login = None
         self._ms_login_in_progress: bool = False
         self.rpc = DiscordRPC()
         QTimer.singleShot(0, self._start_rpc)
@@ -949,8 +1010,9 @@ class GWLauncher(QMainWindow):
         self._refresh_list()
         self._set_play_ready(False)
         self._refresh_versions_async()
-        from auth_backend import list_accounts
+        from auth_backend import start_background_refresh
         self._refresh_login_status()
+        start_background_refresh()
         
     def _open_modrinth(self):
         from modrinth_browser import ModrinthBrowser
@@ -959,11 +1021,11 @@ class GWLauncher(QMainWindow):
         dlg.exec()
         
     def _refresh_login_status(self):
-        from auth_backend import list_accounts
-        accounts = list_accounts()
-        if accounts:
-            acc = next(iter(accounts.values()))
-            self.titlebar.lbl_login_status.setText(acc.get("name", "Jugador"))
+        from auth_backend import resolve_account
+        acc = resolve_account()
+        if acc:
+            name = acc.get("name", "Jugador")
+            self.titlebar.lbl_login_status.setText(f"{name} (vuelve a iniciar sesión)" if acc.get("needs_login") else name)
         else:
             self.titlebar.lbl_login_status.setText("Iniciar sesión con Mojang")
 
@@ -1021,9 +1083,9 @@ class GWLauncher(QMainWindow):
 
     def _profiles_path(self) -> Path: return UI_PROFILES
     def _load_profiles(self) -> Dict[str,Any]:
-        return _read_json(self._profiles_path(), {})
+        return store.open_store(self._profiles_path(), delay=PROFILES_SAVE_DELAY).read()
     def _save_profiles(self):
-        _write_json(self._profiles_path(), self._profiles)
+        store.open_store(self._profiles_path(), delay=PROFILES_SAVE_DELAY).write(self._profiles)
 
     def _refresh_list(self):
         self.profiles.setUpdatesEnabled(False)
@@ -1188,6 +1250,17 @@ class GWLauncher(QMainWindow):
         self.headline.setText(self._current_profile_name() if has else "Selecciona un perfil")
         self._set_play_ready(has)
         self._update_profile_glow()
+        self._prefetch_selected()
+
+    def _prefetch_selected(self):
+        import gwlauncher_backend as backend
+        name = self._current_profile_name()
+        p = self._profiles.get(name) if name else None
+        if not p or not p.get("version"):
+            backend.prefetcher.cancel()
+            return
+        loader = p.get("modloader", "vanilla")
+        backend.prefetcher.start(p["version"], "" if loader == "vanilla" else (loader or ""), name)
 
     def _sync_btn_edit_style(self):
         self.btn_edit.setProperty("enabled", "true" if self.btn_edit.isEnabled() else "false"); self.btn_edit.style().unpolish(self.btn_edit); self.btn_edit.style().polish(self.btn_edit)
@@ -1223,14 +1296,14 @@ class GWLauncher(QMainWindow):
         loader = p.get("modloader", "vanilla")
         ram = int(p.get("ram", 2048))
         jvm = p.get("jvmFlags", [])
+        account_id = None
         if p.get("auth") == "microsoft":
-            from auth_backend import list_accounts
-            accounts = list_accounts()
-            if not accounts:
+            from auth_backend import resolve_account
+            acc = resolve_account(p.get("account"))
+            if not acc:
                 QMessageBox.warning(self, "Cuenta Microsoft", "No tienes ninguna cuenta vinculada. Inicia sesión primero.")
                 return
-            acc = next(iter(accounts.values()))
-            username = acc["name"]
+            username, account_id = acc["name"], acc["id"]
         else:
             username = p.get("username") or "Player"
             if name == "GatitosWorld ModPack" and not p.get("username"):
@@ -1244,7 +1317,14 @@ class GWLauncher(QMainWindow):
         self.loading.start("Preparando el lanzamiento…")
         self._set_play_ready(False)
         self._launch_thread = QThread(self)
-        self._launch_worker = GWLauncher.LaunchWorker(version, username, loader, ram, jvm, GW_DIR, name)
+        import gwlauncher_backend as backend
+        backend.prefetcher.cancel()
+        heap_mode = p.get("heapMode", "fixed")
+        if heap_mode == "auto":
+            ram = backend.heap_suggestion(name) or ram
+        gc_log = backend.gc_log_path(name) if heap_mode != "fixed" else None
+        self._session = (name, ram) if gc_log else None
+        self._launch_worker = GWLauncher.LaunchWorker(version, username, loader, ram, jvm, GW_DIR, name, gc_log, account_id, bool(p.get("optimize", False)))
         self._launch_worker.moveToThread(self._launch_thread)
         self._launch_worker.progress.connect(self.loading.set_progress)
         self._launch_worker.finished_err.connect(self._on_launch_error)
@@ -1268,15 +1348,25 @@ class GWLauncher(QMainWindow):
         proc.readyReadStandardOutput.connect(lambda: sys.stdout.write(proc.readAllStandardOutput().data().decode(errors="ignore")))
         proc.readyReadStandardError.connect(lambda: sys.stderr.write(proc.readAllStandardError().data().decode(errors="ignore")))
         proc.started.connect(lambda: (self.loading.finish(), self._rpc_set_ip(), self.hide(), self.tray.showMessage("GW Launcher", "Minecraft iniciado", QSystemTrayIcon.Information, 2000)))
-        proc.finished.connect(lambda _, __: QApplication.instance().quit())
+        proc.finished.connect(lambda _, __: (self._record_session(), QApplication.instance().quit()))
         proc.start()
 
+    def _record_session(self):
+        session = getattr(self, "_session", None)
+        if not session:
+            return
+        try:
+            import gwlauncher_backend as backend
+            backend.record_gc_session(*session)
+        except Exception:
+            pass
+
     def show_profiles_json(self):
         html = "<pre>"+json.dumps(self._profiles, indent=2, ensure_ascii=False)+"</pre>"
         self.modal.show_modal("Perfiles", html, [("Cerrar", self.modal.hide_modal)])
 
-    def _open_login(self):
-        from auth_backend import begin_device_login, complete_device_login, _save_accounts, list_accounts
+    def _open_login(self, add: bool = False):
+        from auth_backend import DeviceLogin, begin_device_login, finish_device_login, list_accounts, remove_account, resolve_account, set_active_account
 
         if self._ms_login_in_progress:
             try:
@@ -1286,18 +1376,31 @@ class GWLauncher(QMainWindow):
                 pass
             return
 
-        accounts = list_accounts()
-        if accounts:
-            acc = next(iter(accounts.values()))
+        acc = None if add else resolve_account()
+        if acc:
             def do_logout():
-                _save_accounts({})
+                remove_account(acc["id"])
                 self.modal.hide_modal()
                 QMessageBox.information(self, "Cerrar sesión", f"Cerró la sesión de {acc.get('name')}.")
                 self._refresh_login_status()
+            def do_switch():
+                accounts = list_accounts()
+                names = [a.get("name", aid) for aid, a in accounts.items()]
+                name, ok = QInputDialog.getItem(self, "Cambiar cuenta", "Cuenta:", names, names.index(acc.get("name", acc["id"])), False)
+                if ok:
+                    set_active_account(list(accounts)[names.index(name)])
+                    self.modal.hide_modal()
+                    self._refresh_login_status()
+            def do_add():
+                self.modal.hide_modal()
+                self._open_login(add=True)
+            buttons = [("Cancelar", self.modal.hide_modal), ("➕ Añadir cuenta", do_add), ("❌ Cerrar sesión", do_logout)]
+            if len(list_accounts()) > 1:
+                buttons.insert(1, ("🔄 Cambiar cuenta", do_switch))
             self.modal.show_modal_2(
-                "Cerrar sesión",
-                f"<p style='color:#ff5555;font-weight:bold;'>¿Cerrar sesión <b>{acc.get('name')}</b>?</p>",
-                [("Cancelar", self.modal.hide_modal), ("❌ Cerrar sesión", do_logout)]
+                "Cuenta",
+                f"<p style='color:#ff5555;font-weight:bold;'>Sesión iniciada como <b>{acc.get('name')}</b></p>",
+                buttons
             )
             return
 
@@ -1318,118 +1421,70 @@ class GWLauncher(QMainWindow):
         def open_link():
             QDesktopServices.openUrl(QUrl(step["verification_uri"]))
 
-        class DeviceWorker(QObject):
-            finished = Signal(dict)
-            failed = Signal(str)
-
-            @Slot()
-            def run(self):
-                try:
-                    acc = complete_device_login(step["device_code"], 3, 300)
-                    self.finished.emit(acc)
-                except Exception as ex:
-                    self.failed.emit(str(ex))
-
-        worker = DeviceWorker()
-        th = QThread(self)
-        worker.moveToThread(th)
-        th.setObjectName("MsLoginThread")
-        th.started.connect(worker.run)
-
-        self._ms_login_worker = worker
-        self._ms_login_thread = th
-        
-        def stop_thread():
-            try:
-                th.quit()
-                th.wait(50)
-            except Exception:
-                pass
-            worker.deleteLater()
-            th.deleteLater()
-            
-        def _stop_ms_timers():
-            if hasattr(self, "_ms_login_timer") and self._ms_login_timer.isActive():
-                self._ms_login_timer.stop()
-            if hasattr(self, "_ms_login_progress") and self._ms_login_progress.isActive():
-                self._ms_login_progress.stop()
+        timeout_s = 300
+        login = DeviceLogin(step, timeout_s)
+        self._ms_login = login
 
-        self._ms_login_cancelled = False
-        
-        def _thread_quit_and_cleanup():
-            t = self._ms_login_thread
-            if t:
-                try:
-                    t.quit()
-                    t.wait(200)
-                except Exception:
-                    pass
-            self._cleanup_ms_login_thread(force=False)
-            
         def _finish_ui_common():
-            _stop_ms_timers()
+            login.cancel()
+            self._ms_login_progress.stop()
             self.loading.finish()
             self._ms_login_in_progress = False
+            self._ms_login = None
             try:
                 self.titlebar.btn_login.setEnabled(True)
             except Exception:
                 pass
-                
-        def on_done(acc: dict):
-            def ui_update():
-                _finish_ui_common()
-
-                if not self._ms_login_cancelled:
-                    data = {acc["id"]: acc}
-                    _save_accounts(data)
 
-                    sel = self._current_profile_name()
-                    if sel and sel in self._profiles and not self._profiles[sel].get("username"):
-                        self._profiles[sel]["username"] = acc.get("name", "")
-                        self._save_profiles()
-                        self._refresh_list()
+        def on_done(acc: dict):
+            if login.cancelled.is_set():
+                return
+            _finish_ui_common()
+            sel = self._current_profile_name()
+            if sel and sel in self._profiles and not self._profiles[sel].get("username"):
+                self._profiles[sel]["username"] = acc.get("name", "")
+                self._save_profiles()
+                self._refresh_list()
 
-                    self.modal.hide_modal()
-                    self._refresh_login_status()
-                    self._set_play_ready(len(self.profiles.selectedItems()) > 0)
-                    try:
-                        self.tray.showMessage(
-                            "GW Launcher",
-                            f"Sesión iniciada como {acc.get('name','')}",
-                            QSystemTrayIcon.Information,
-                            2000
-                        )
-                    except Exception:
-                        pass
-                _thread_quit_and_cleanup()
-            QTimer.singleShot(0, ui_update)
+            self.modal.hide_modal()
+            self._refresh_login_status()
+            self._set_play_ready(len(self.profiles.selectedItems()) > 0)
+            try:
+                self.tray.showMessage(
+                    "GW Launcher",
+                    f"Sesión iniciada como {acc.get('name','')}",
+                    QSystemTrayIcon.Information,
+                    2000
+                )
+            except Exception:
+                pass
 
         def on_fail(msg: str):
-            def ui_update():
-                _finish_ui_common()
-
-                if not self._ms_login_cancelled:
-                    self.modal.show_modal_2(
-                        "Error de login",
-                        msg,
-                        [("Cerrar", self.modal.hide_modal)]
-                    )
-
-                _thread_quit_and_cleanup()
+            if login.cancelled.is_set():
+                return
+            _finish_ui_common()
+            self.modal.show_modal_2(
+                "Error de login",
+                msg,
+                [("Cerrar", self.modal.hide_modal)]
+            )
 
-            QTimer.singleShot(0, ui_update)
+        def poll():
+            if not login.cancelled.is_set():
+                self._run_task(login.poll, (), on_poll, on_fail)
 
-        worker.finished.connect(on_done)
-        worker.failed.connect(on_fail)
+        def on_poll(tokens):
+            if login.cancelled.is_set():
+                return
+            if tokens is None:
+                QTimer.singleShot(login.interval * 1000, poll)
+            else:
+                self._ms_login_progress.stop()
+                self.loading.set_progress(100, "Verificando cuenta…")
+                self._run_task(finish_device_login, (tokens,), on_done, on_fail)
 
-        timeout_s = 300
         self.loading.start("Iniciando sesión con Microsoft…")
-        th.start()
-
-        self._ms_login_timer = QTimer(self)
-        self._ms_login_timer.setSingleShot(True)
-        self._ms_login_timer.timeout.connect(lambda: on_fail("Tiempo de espera agotado (5 min). Intenta de nuevo."))
-        self._ms_login_timer.start(timeout_s * 1000)
+        QTimer.singleShot(login.interval * 1000, poll)
 
         self._ms_login_elapsed = 0
         
@@ -1445,7 +1500,8 @@ class GWLauncher(QMainWindow):
         self._ms_login_progress.start(1000)
         
         def on_cancel():
-            self._ms_login_cancelled = True
+            if login.cancelled.is_set():
+                return
             _finish_ui_common()
             self.modal.hide_modal()
             
@@ -1458,8 +1514,11 @@ class GWLauncher(QMainWindow):
         
     def closeEvent(self, e):
         try:
-            self._cleanup_ms_login_thread(force=True)
+            if self._ms_login:
+                self._ms_login.cancel()
             self._cleanup_launch_thread()
+            import gwlauncher_backend as backend
+            backend.prefetcher.cancel()
             try:
                 self.particles.setActive(False)
             except Exception:
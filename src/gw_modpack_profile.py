@@ -1,13 +1,11 @@
 # gw_modpack_profile.py
 from pathlib import Path
-import json
+import store
 
 GW_DIR = Path.home() / ".gwlauncher"
 UI_PROFILES = GW_DIR / "ui_profiles.json"
 
 def add_gatitosworld_profile():
-    UI_PROFILES.parent.mkdir(parents=True, exist_ok=True)
-
     profile = {
         "name": "GatitosWorld ModPack",
         "name_locked": True,
@@ -20,17 +18,8 @@ def add_gatitosworld_profile():
         "port": 19431
     }
 
-    if UI_PROFILES.exists():
-        try:
-            profiles = json.loads(UI_PROFILES.read_text(encoding="utf-8"))
-        except Exception:
-            profiles = {}
-    else:
-        profiles = {}
-
-    profiles[profile["name"]] = {k: v for k, v in profile.items() if k != "name"}
-
-    UI_PROFILES.write_text(json.dumps(profiles, indent=2, ensure_ascii=False), encoding="utf-8")
+    with store.open_store(UI_PROFILES).transaction() as profiles:
+        profiles[profile["name"]] = {k: v for k, v in profile.items() if k != "name"}
     print(f"Perfil '{profile['name']}' agregado/actualizado en {UI_PROFILES}")
 
 if __name__ == "__main__":
@@ -1,21 +1,43 @@
 # gwlauncher_backend.py
 from __future__ import annotations
-import argparse, json, os, subprocess, sys, uuid, requests, tarfile, zipfile, shutil, time, hashlib
-from functools import partial
+import argparse, ctypes, glob, io, json, os, platform, re, select, subprocess, sys, uuid, tarfile, zipfile, shutil, threading, time, hashlib, zlib
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Dict, List, Literal, Optional, Callable
 import minecraft_launcher_lib as mll
-from minecraft_launcher_lib import utils
 import auth_backend as authb
+import downloader as dl
+import http_client as http
+from http_cache import ResponseCache
+import jvm_flags
+import store
 
 GW_DIR: Path = Path.home() / ".gwlauncher"
 VERSIONS_DIR: Path = GW_DIR / "versions"
 INSTANCES_DIR: Path = GW_DIR / "instances"
 JAVA_DIR: Path = GW_DIR / "java"
+CDS_DIR: Path = GW_DIR / "cds"
+JAVA_DOWNLOAD_MAJORS = (8, 17, 21)
+USE_SYSTEM_JAVA = os.getenv("GW_SYSTEM_JAVA", "1") != "0"
+JAVA_SOURCE = os.getenv("GW_JAVA_SOURCE", "mojang")
+STREAM_JAVA_EXTRACT = os.getenv("GW_STREAM_JAVA", "0") == "1"
+RUNTIME_DIR: Path = GW_DIR / "runtime"
+MOJANG_RUNTIMES_URL = "https://launchermeta.mojang.com/v1/products/java-runtime/2ec0cc96c44e5a76b9c8b7c39df7210883d12871/all.json"
 _PROFILES_FILE = GW_DIR / "profiles.json"
+GC_LOG_DIR: Path = GW_DIR / "gclogs"
+_HEAP_STATS_FILE = GW_DIR / "heap-stats.json"
+HEAP_STATS_SESSIONS = 5
+_profiles = store.open_store(_PROFILES_FILE)
+_heap_stats = store.open_store(_HEAP_STATS_FILE)
 
 MODPACK_URL = "https://github.com/RottenBoneStudios/GW-Launcher/releases/download/1.0.0v_BUILD-0011/GW_ModPack.zip"
 MODPACK_SHA256 = "b61368e07729ba4704c48b5f88a38ea51fe6073c11e908fc7a0136d91aef06a9"
+MODPACK_MANIFEST = ".gw_modpack.json"
+MODPACK_INDEX_URL = MODPACK_URL.rsplit("/", 1)[0] + "/GW_ModPack.json"
+MODPACK_INDEX_SHA256 = ""
+MODPACK_DELTA_MAX_RATIO = 0.5
 
 def _popen_no_window(*args, **kwargs):
     if os.name == "nt":
@@ -25,67 +47,104 @@ def _popen_no_window(*args, **kwargs):
         kwargs["startupinfo"] = si
     return _real_popen(*args, **kwargs)
 
+_step_locks: Dict[str, threading.RLock] = {}
+_step_locks_guard = threading.Lock()
+
+def _step_lock(key: str) -> threading.RLock:
+    with _step_locks_guard:
+        if key not in _step_locks:
+            _step_locks[key] = threading.RLock()
+        return _step_locks[key]
+
 def _ensure_dir() -> None:
     for d in (GW_DIR, VERSIONS_DIR, INSTANCES_DIR, JAVA_DIR):
         d.mkdir(parents=True, exist_ok=True)
         if os.name == "posix":
             os.chmod(d, 0o755)
 
-def _load_profiles() -> Dict[str, Any]:
-    if not _PROFILES_FILE.exists():
-        return {}
-    try:
-        return json.loads(_PROFILES_FILE.read_text(encoding="utf-8"))
-    except json.JSONDecodeError:
-        return {}
+def save_profile(username: str, version: str) -> None:
+    if _profiles.get(username) != {"last_version": version}:
+        with _profiles.transaction() as profiles:
+            profiles[username] = {"last_version": version}
 
-def _save_profiles(profiles: Dict[str, Any]) -> None:
-    _PROFILES_FILE.write_text(json.dumps(profiles, indent=2), encoding="utf-8")
-    if os.name == "posix":
-        os.chmod(_PROFILES_FILE, 0o644)
+def gc_log_path(profile: str) -> Path:
+    GC_LOG_DIR.mkdir(parents=True, exist_ok=True)
+    return GC_LOG_DIR / f"{hashlib.sha1(profile.encode()).hexdigest()[:12]}.log"
 
-def save_profile(username: str, version: str) -> None:
-    profiles = _load_profiles()
-    profiles[username] = {"last_version": version}
-    _save_profiles(profiles)
+def record_gc_session(profile: str, heap_mb: int) -> Optional[Dict[str, Any]]:
+    stats = jvm_flags.parse_gc_log(gc_log_path(profile))
+    if not stats:
+        return None
+    stats.update(heap_mb=heap_mb, ended=int(time.time()))
+    with _heap_stats.transaction() as data:
+        data[profile] = (data.get(profile, []) + [stats])[-HEAP_STATS_SESSIONS:]
+    return stats
+
+def heap_suggestion(profile: str) -> Optional[int]:
+    return jvm_flags.suggest_heap_mb(_heap_stats.get(profile, []))
 
-def _patch_downloader(buffer_size: int = 1 << 20, max_workers: int = 64) -> None:
+_java_requirements: Dict[str, Dict[str, Any]] = {}
+_version_json_cache = ResponseCache(GW_DIR / "version-json-cache", 16 * 1024 * 1024)
+_LOADER_ID = re.compile(r"^(?:fabric|quilt)-loader-[^-]+-(.+)$|^([^-]+)-forge")
+
+def _manifest_entry(version_id: str) -> Optional[Dict[str, Any]]:
+    path = GW_DIR / VERSION_SOURCES["Vanilla"][1]
+    for refresh in (False, True):
+        if refresh:
+            try:
+                _dump_available_versions_json()
+            except Exception:
+                return None
+        try:
+            versions = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        entry = next((v for v in versions if v.get("id") == version_id), None)
+        if entry and entry.get("url"):
+            return entry
+    return None
+
+def _remote_version_json(version_id: str) -> Optional[Dict[str, Any]]:
+    entry = _manifest_entry(version_id)
+    if entry is None:
+        return None
     try:
-        from minecraft_launcher_lib import _helper as _mll_helper
-        _mll_helper.download_file = partial(_mll_helper.download_file, buffer_size=buffer_size)
+        return _version_json_cache.get_json(entry["url"], ttl=float("inf"))
     except Exception:
-        pass
-    import concurrent.futures as _cf
-    _orig_init = _cf.ThreadPoolExecutor.__init__
-    def _patched_init(self, max_workers: int = max_workers, *a, **kw):
-        return _orig_init(self, max_workers, *a, **kw)
-    _cf.ThreadPoolExecutor.__init__ = _patched_init
-
-_patch_downloader()
-
-def get_required_java_version(minecraft_version: str) -> int:
-    lowered = minecraft_version.lower()
-    if "fabric" in lowered or "quilt" in lowered:
-        return 21
-    parts = minecraft_version.split(".")
-    nums = []
-    for p in parts:
+        return None
+
+def _java_requirement(version_id: str) -> Optional[Dict[str, Any]]:
+    if version_id in _java_requirements:
+        return _java_requirements[version_id]
+    vid: Optional[str] = version_id
+    data: Optional[Dict[str, Any]] = None
+    for _ in range(8):
         try:
-            nums.append(int(p))
-        except ValueError:
+            data = json.loads((VERSIONS_DIR / vid / f"{vid}.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            data = _remote_version_json(vid)
+        if data is None:
+            m = _LOADER_ID.match(vid)
+            if not m:
+                break
+            vid = m.group(1) or m.group(2)
+            continue
+        if data.get("javaVersion") or not data.get("inheritsFrom"):
             break
-    if not nums:
-        return 8
-    major = nums[0]
-    minor = nums[1] if len(nums) > 1 else 0
-    if major == 1:
-        if 8 <= minor <= 16:
-            return 8
-        elif 17 <= minor <= 19:
-            return 17
-        elif minor >= 20:
-            return 21
-    return 21
+        vid = data["inheritsFrom"]
+    if data is None:
+        return None
+    requirement = data.get("javaVersion") or {"majorVersion": 8}
+    _java_requirements[version_id] = requirement
+    return requirement
+
+def get_required_java_version(version_id: str) -> int:
+    requirement = _java_requirement(version_id)
+    return int(requirement["majorVersion"]) if requirement else 8
+
+def get_required_java_component(version_id: str) -> Optional[str]:
+    requirement = _java_requirement(version_id)
+    return requirement.get("component") if requirement else None
 
 def sha256sum(path: Path) -> str:
     h = hashlib.sha256()
@@ -94,22 +153,352 @@ def sha256sum(path: Path) -> str:
             h.update(chunk)
     return h.hexdigest()
 
-def download_java_runtime(java_version: int, progress_cb: Optional[Callable[[int, str], None]] = None) -> Path:
+def _download_progress(label: str, progress_cb: Optional[Callable[[int, str], None]]) -> Optional[dl.Progress]:
+    if not progress_cb:
+        return None
+    start_time = time.time()
+    last_update = start_time
+    def report(downloaded: int, total: int) -> None:
+        nonlocal last_update
+        if not total:
+            return
+        now = time.time()
+        if now - last_update >= 1 or downloaded == total:
+            percent = int(downloaded * 100 / total)
+            total_mb = total / 1024 / 1024
+            done_mb = downloaded / 1024 / 1024
+            speed = done_mb / max(now - start_time, 0.001)
+            progress_cb(percent // 2, f"{label} ({done_mb:.1f}/{total_mb:.1f} MB) {speed:.2f} MB/s")
+            last_update = now
+    return report
+
+def _download_and_unpack_java(java_version: int, url: str, package_type: str, expected_hash: Optional[str], progress: Optional[dl.Progress], java_path: Path) -> None:
+    temp_file = JAVA_DIR / f"java_{java_version}.{package_type}"
+    try:
+        dl.download(url, temp_file, sha256=expected_hash, progress=progress)
+    except dl.ChecksumMismatch as e:
+        raise RuntimeError(f"Archivo corrupto de Java {java_version}, hash inválido") from e
+    extract_path = JAVA_DIR / f"java_{java_version}_temp"
+    extract_path.mkdir(parents=True, exist_ok=True)
+    if package_type == "zip":
+        with zipfile.ZipFile(temp_file, "r") as zf:
+            zf.extractall(extract_path)
+    else:
+        with tarfile.open(temp_file, "r:gz") as tf:
+            tf.extractall(extract_path)
+    extracted_dir = next(extract_path.iterdir(), None)
+    if not extracted_dir:
+        raise RuntimeError(f"No se extrajeron archivos para Java {java_version}")
+    shutil.move(str(extracted_dir), java_path)
+    temp_file.unlink(missing_ok=True)
+    shutil.rmtree(extract_path, ignore_errors=True)
+
+def _java_executable(home: Path) -> Optional[Path]:
+    bin_dir = home / "bin"
+    names = ("javaw.exe", "java.exe") if os.name == "nt" else ("java",)
+    for name in names:
+        if (bin_dir / name).is_file():
+            return bin_dir / name
+    return None
+
+def _release_major(home: Path) -> Optional[int]:
+    try:
+        for line in (home / "release").read_text(encoding="utf-8", errors="ignore").splitlines():
+            if line.startswith("JAVA_VERSION="):
+                return _version_major(line.split("=", 1)[1].strip().strip('"'))
+    except OSError:
+        pass
+    return int(home.name) if home.name.isdigit() else None
+
+_runtime_index: tuple[Optional[int], Dict[int, Path]] = (None, {})
+
+def installed_java_runtimes() -> Dict[int, Path]:
+    global _runtime_index
+    try:
+        mtime = JAVA_DIR.stat().st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    if _runtime_index[0] == mtime:
+        return dict(_runtime_index[1])
+    runtimes: Dict[int, Path] = {}
+    for home in sorted(JAVA_DIR.iterdir()):
+        exe = _java_executable(home) if home.is_dir() else None
+        major = _release_major(home) if exe else None
+        if major and major not in runtimes:
+            runtimes[major] = exe
+    _runtime_index = (mtime, runtimes)
+    return dict(runtimes)
+
+_JAVA_VERSION = re.compile(r"(?:1\.(?=\d))?(\d+)")
+
+def _version_major(name: str) -> Optional[int]:
+    m = _JAVA_VERSION.match(name.strip())
+    return int(m.group(1)) if m else None
+
+def _mojang_platform() -> Optional[str]:
+    name = mll.runtime._get_jvm_platform_string()
+    if name == "linux" and _normalize_arch(platform.machine()) != "amd64":
+        return None
+    return name
+
+def _mojang_home(base: Path) -> Path:
+    bundle = base / "jre.bundle" / "Contents" / "Home"
+    return bundle if bundle.is_dir() else base
+
+def mojang_java_runtimes() -> Dict[int, Path]:
+    runtimes: Dict[int, Path] = {}
+    plat = _mojang_platform()
+    if not plat or not RUNTIME_DIR.is_dir():
+        return runtimes
+    for comp_dir in sorted(RUNTIME_DIR.iterdir()):
+        root = comp_dir / plat
+        try:
+            major = _version_major((root / ".version").read_text(encoding="utf-8").strip())
+        except OSError:
+            continue
+        exe = _java_executable(_mojang_home(root / comp_dir.name))
+        if major and exe and major not in runtimes:
+            runtimes[major] = exe
+    return runtimes
+
+def _mojang_component(required: int, preferred: Optional[str] = None) -> Optional[tuple[str, Dict[str, Any]]]:
+    plat = _mojang_platform()
+    if not plat:
+        return None
+    resp = http.session().get(MOJANG_RUNTIMES_URL)
+    resp.raise_for_status()
+    components: Dict[str, List[Dict[str, Any]]] = resp.json().get(plat, {})
+    if preferred and components.get(preferred):
+        return preferred, components[preferred][0]
+    best: Optional[tuple[int, str, Dict[str, Any]]] = None
+    for component, entries in components.items():
+        if not entries:
+            continue
+        major = _version_major(entries[0]["version"]["name"])
+        if major is None or not (major == required or (required > 8 and major > required)):
+            continue
+        if best is None or major < best[0]:
+            best = (major, component, entries[0])
+    return (best[1], best[2]) if best else None
+
+def _read_runtime_stamps(path: Path) -> Dict[str, tuple[str, int]]:
+    stamps: Dict[str, tuple[str, int]] = {}
+    try:
+        lines = path.read_text(encoding="utf-8").splitlines()
+    except OSError:
+        return stamps
+    for line in lines:
+        rel, sep, rest = line.partition(" /#// ")
+        if sep:
+            sha1, _, stamp = rest.partition(" ")
+            stamps[rel] = (sha1, int(stamp or 0))
+    return stamps
+
+def _runtime_blobs(exclude: Path) -> Dict[str, Path]:
+    blobs: Dict[str, Path] = {}
+    for stamp_file in RUNTIME_DIR.glob("*/*/*.sha1"):
+        root = stamp_file.parent
+        if root == exclude:
+            continue
+        for rel, (sha1, _) in _read_runtime_stamps(stamp_file).items():
+            blobs.setdefault(sha1, root / stamp_file.stem / rel)
+    return blobs
+
+def _sha1sum(path: Path) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _link_blob(src: Path, target: Path, sha1: str) -> bool:
+    tmp = target.with_name(f"{target.name}.{threading.get_ident()}.link")
+    try:
+        try:
+            os.link(src, tmp)
+        except OSError:
+            shutil.copy2(src, tmp)
+        if _sha1sum(tmp) != sha1:
+            tmp.unlink()
+            return False
+        os.replace(tmp, target)
+        return True
+    except OSError:
+        tmp.unlink(missing_ok=True)
+        return False
+
+def install_mojang_runtime(required: int, progress_cb: Optional[Callable[[int, str], None]] = None, component: Optional[str] = None) -> Optional[Path]:
+    found = _mojang_component(required, component)
+    if not found:
+        return None
+    component, entry = found
+    root = RUNTIME_DIR / component / _mojang_platform()
+    base = root / component
+    resp = http.session().get(entry["manifest"]["url"])
+    resp.raise_for_status()
+    if hashlib.sha1(resp.content).hexdigest() != entry["manifest"]["sha1"]:
+        raise RuntimeError(f"Manifiesto de Java {component} inválido")
+    files: Dict[str, Any] = resp.json()["files"]
+    stamps = _read_runtime_stamps(root / f"{component}.sha1")
+    blobs = _runtime_blobs(root)
+    sched = dl.scheduler()
+    label = f"Instalando Java {entry['version']['name']}…"
+    done = [0, -1]
+    lock = threading.Lock()
+    def install(rel: str, info: Dict[str, Any]) -> Optional[tuple[str, str, int]]:
+        target = base / rel
+        result = None
+        if info["type"] == "directory":
+            target.mkdir(parents=True, exist_ok=True)
+        elif info["type"] == "link":
+            target.parent.mkdir(parents=True, exist_ok=True)
+            if not target.is_symlink():
+                try:
+                    os.symlink(info["target"], target)
+                except OSError:
+                    pass
+        elif info["type"] == "file":
+            sha1 = info["downloads"]["raw"]["sha1"]
+            target.parent.mkdir(parents=True, exist_ok=True)
+            stamp = stamps.get(rel)
+            current = target.is_file() and (target.stat().st_mtime_ns == stamp[1] if stamp and stamp[0] == sha1 else _sha1sum(target) == sha1)
+            if not current and not (sha1 in blobs and _link_blob(blobs[sha1], target, sha1)):
+                lzma_dl = info["downloads"].get("lzma")
+                src = lzma_dl or info["downloads"]["raw"]
+                if not sched.fetch(src["url"], str(target), sha1=sha1, lzma_compressed=lzma_dl is not None, overwrite=True):
+                    raise RuntimeError(f"No se pudo descargar {rel} de Java {component}")
+            if info.get("executable") and os.name == "posix":
+                os.chmod(target, 0o755)
+            result = (rel, sha1, target.stat().st_mtime_ns)
+        with lock:
+            done[0] += 1
+            percent = done[0] * 50 // len(files)
+            if progress_cb and percent != done[1]:
+                done[1] = percent
+                progress_cb(percent, f"{label} ({done[0]}/{len(files)} archivos)")
+        return result
+    with ThreadPoolExecutor(max_workers=sched.max_workers) as ex:
+        installed = [r for r in ex.map(lambda kv: install(*kv), sorted(files.items(), key=lambda kv: kv[1]["type"] != "directory")) if r]
+    store.atomic_write(root / f"{component}.sha1", "".join(f"{rel} /#// {sha1} {stamp}\n" for rel, sha1, stamp in installed))
+    store.atomic_write(root / ".version", entry["version"]["name"])
+    return _java_executable(_mojang_home(base))
+
+def _select_runtime(runtimes: Dict[int, Path], required: int, exact: bool = False) -> Optional[Path]:
+    if required in runtimes:
+        return runtimes[required]
+    if required > 8 and not exact:
+        newer = sorted(m for m in runtimes if m >= required)
+        if newer:
+            return runtimes[newer[0]]
+    return None
+
+_JAVA_REGISTRY_FILE = GW_DIR / "java-registry.json"
+_java_registry = store.open_store(_JAVA_REGISTRY_FILE)
+_ARCH_ALIASES = {"x86_64": "amd64", "x64": "amd64", "arm64": "aarch64"}
+
+def _normalize_arch(arch: str) -> str:
+    arch = arch.lower()
+    return _ARCH_ALIASES.get(arch, arch)
+
+def _system_java_homes() -> List[Path]:
+    homes: List[Path] = []
+    if os.getenv("JAVA_HOME"):
+        homes.append(Path(os.environ["JAVA_HOME"]))
+    on_path = shutil.which("java")
+    if on_path:
+        homes.append(Path(on_path).resolve().parent.parent)
+    if os.name == "nt":
+        roots = [Path(os.environ[var]) / vendor for var in ("ProgramFiles", "ProgramW6432") if os.getenv(var) for vendor in ("Java", "Eclipse Adoptium", "Microsoft", "Zulu", "BellSoft")]
+    elif sys.platform == "darwin":
+        roots = [Path("/Library/Java/JavaVirtualMachines"), Path.home() / "Library/Java/JavaVirtualMachines"]
+    else:
+        roots = [Path("/usr/lib/jvm"), Path("/usr/java"), Path("/opt/java"), Path("/opt")]
+    for root in roots:
+        if root.is_dir():
+            for child in sorted(root.iterdir()):
+                homes.append(child / "Contents" / "Home" if (child / "Contents" / "Home").is_dir() else child)
+    unique: Dict[Path, Path] = {}
+    for home in homes:
+        try:
+            unique.setdefault(home.resolve(), home)
+        except OSError:
+            continue
+    return list(unique)
+
+def _probe_java(exe: Path) -> Dict[str, Any]:
+    kwargs = {"creationflags": subprocess.CREATE_NO_WINDOW} if os.name == "nt" else {}
+    try:
+        out = subprocess.run([str(exe), "-XshowSettings:properties", "-version"], capture_output=True, text=True, timeout=15, **kwargs)
+    except (OSError, subprocess.SubprocessError):
+        return {}
+    props = {}
+    for line in out.stderr.splitlines():
+        key, sep, value = line.strip().partition(" = ")
+        if sep:
+            props[key] = value
+    spec = props.get("java.specification.version", "")
+    try:
+        major = int(spec.split(".")[1]) if spec.startswith("1.") else int(spec)
+    except (ValueError, IndexError):
+        return {}
+    return {"major": major, "arch": _normalize_arch(props.get("os.arch", "")), "vendor": props.get("java.vendor", "")}
+
+def system_java_runtimes() -> List[Dict[str, Any]]:
     _ensure_dir()
+    cache: Dict[str, Any] = _java_registry.read()
+    machine = _normalize_arch(platform.machine())
+    registry: Dict[str, Any] = {}
+    found: List[Dict[str, Any]] = []
+    for home in _system_java_homes():
+        probe_exe = home / "bin" / ("java.exe" if os.name == "nt" else "java")
+        try:
+            mtime = probe_exe.stat().st_mtime_ns
+        except OSError:
+            continue
+        entry = cache.get(str(probe_exe))
+        if not entry or entry.get("mtime") != mtime:
+            entry = {"mtime": mtime, **_probe_java(probe_exe)}
+        registry[str(probe_exe)] = entry
+        exe = _java_executable(home)
+        if exe and entry.get("major") and entry.get("arch") == machine:
+            found.append({"path": exe, "major": entry["major"], "vendor": entry.get("vendor", "")})
+    if registry != cache:
+        _java_registry.write(registry)
+    return found
+
+def _java_download_major(required: int) -> int:
+    for major in JAVA_DOWNLOAD_MAJORS:
+        if major >= required and (major == required or required > 8):
+            return major
+    raise RuntimeError(f"No hay un Java {required} disponible para descargar")
+
+def recommended_java_major(version_id: str) -> int:
+    return _java_download_major(get_required_java_version(version_id))
+
+def download_java_runtime(java_version: int, progress_cb: Optional[Callable[[int, str], None]] = None, stream_extract: bool = STREAM_JAVA_EXTRACT, component: Optional[str] = None) -> Path:
+    _ensure_dir()
+    found = _select_runtime({**installed_java_runtimes(), **mojang_java_runtimes()}, java_version)
+    if found is None and USE_SYSTEM_JAVA:
+        system: Dict[int, Path] = {}
+        for rt in system_java_runtimes():
+            system.setdefault(rt["major"], rt["path"])
+        found = _select_runtime(system, java_version, exact=True)
+    if found:
+        return found
+    if JAVA_SOURCE == "mojang":
+        with _step_lock(f"java-runtime:{java_version}"):
+            found = _select_runtime(mojang_java_runtimes(), java_version) or install_mojang_runtime(java_version, progress_cb, component)
+        if found:
+            return found
+    major = _java_download_major(java_version)
+    with _step_lock(f"java:{major}"):
+        return _install_java_runtime(major, progress_cb, stream_extract)
+
+def _install_java_runtime(java_version: int, progress_cb: Optional[Callable[[int, str], None]], stream_extract: bool) -> Path:
     java_path = JAVA_DIR / str(java_version)
-    if java_path.exists():
-        bin_dir = java_path / "bin"
-        if os.name == "nt":
-            javaw = bin_dir / "javaw.exe"
-            javaexe = bin_dir / "java.exe"
-            if javaw.exists():
-                return javaw
-            if javaexe.exists():
-                return javaexe
-        else:
-            javaexe = bin_dir / "java"
-            if javaexe.exists():
-                return javaexe
+    existing = _java_executable(java_path)
+    if existing:
+        return existing
     java_urls = {
         8: {
             "Linux": "https://github.com/RottenBoneStudios/Java-8_JDK/releases/download/Java-8_JDK/jdk-8u451-linux-x64.tar.gz",
@@ -136,106 +525,229 @@ def download_java_runtime(java_version: int, progress_cb: Optional[Callable[[int
     system = "Windows" if os.name == "nt" else "Linux" if os.name == "posix" else "Darwin"
     url = java_urls[java_version][system]
     package_type = ext_map[system]
-    import requests as _rq
-    response = _rq.get(url, stream=True, allow_redirects=True, timeout=60)
-    response.raise_for_status()
-    total = int(response.headers.get("content-length", 0))
-    temp_file = JAVA_DIR / f"java_{java_version}.{package_type}"
-    downloaded = 0
-    start_time = time.time()
-    last_update = start_time
-    with open(temp_file, "wb") as f:
-        for chunk in response.iter_content(chunk_size=8192):
-            if not chunk:
-                continue
-            f.write(chunk)
-            downloaded += len(chunk)
-            if total and progress_cb:
-                now = time.time()
-                elapsed = now - last_update
-                if elapsed >= 1 or downloaded == total:
-                    percent = int(downloaded * 100 / total)
-                    total_mb = total / 1024 / 1024
-                    done_mb = downloaded / 1024 / 1024
-                    speed = (downloaded / 1024 / 1024) / max(now - start_time, 0.001)
-                    progress_cb(percent // 2, f"Descargando Java {java_version}… ({done_mb:.1f}/{total_mb:.1f} MB) {speed:.2f} MB/s")
-                    last_update = now
-    expected_hash = hashes[java_version][system]
-    if expected_hash:
-        file_hash = sha256sum(temp_file)
-        if file_hash != expected_hash:
-            temp_file.unlink(missing_ok=True)
-            raise RuntimeError(f"Archivo corrupto de Java {java_version}, hash inválido")
-    extract_path = JAVA_DIR / f"java_{java_version}_temp"
-    extract_path.mkdir(parents=True, exist_ok=True)
-    if package_type == "zip":
-        with zipfile.ZipFile(temp_file, "r") as zf:
-            zf.extractall(extract_path)
-    else:
-        with tarfile.open(temp_file, "r:gz") as tf:
-            tf.extractall(extract_path)
-    extracted_dir = next(extract_path.iterdir(), None)
-    if not extracted_dir:
-        raise RuntimeError(f"No se extrajeron archivos para Java {java_version}")
-    shutil.move(str(extracted_dir), java_path)
-    temp_file.unlink(missing_ok=True)
-    shutil.rmtree(extract_path, ignore_errors=True)
-    bin_dir = java_path / "bin"
-    if os.name == "nt":
-        javaw = bin_dir / "javaw.exe"
-        javaexe = bin_dir / "java.exe"
-        return javaw if javaw.exists() else javaexe
+    expected_hash = hashes[java_version][system] or None
+    progress = _download_progress(f"Descargando Java {java_version}…", progress_cb)
+    if package_type == "tar.gz" and stream_extract:
+        try:
+            dl.stream_extract_tar(url, java_path, sha256=expected_hash, progress=progress)
+        except dl.ChecksumMismatch as e:
+            raise RuntimeError(f"Archivo corrupto de Java {java_version}, hash inválido") from e
     else:
-        javaexe = bin_dir / "java"
+        _download_and_unpack_java(java_version, url, package_type, expected_hash, progress, java_path)
+    javaexe = _java_executable(java_path)
+    if javaexe is None:
+        raise RuntimeError(f"No se encontró el ejecutable de Java {java_version}")
+    if os.name == "posix":
         os.chmod(javaexe, 0o755)
-        return javaexe
+    return javaexe
 
 ModLoader = Literal["forge", "fabric", "quilt", ""]
 
-def _dump_available_versions_json() -> None:
+def _parse_vanilla_versions(resp) -> Any:
+    return [{"id": v["id"], "type": v["type"], "url": v.get("url"), "releaseTime": v.get("releaseTime"), "complianceLevel": v.get("complianceLevel")} for v in resp.json()["versions"]]
+
+def _parse_maven_versions(resp) -> Any:
+    return re.findall(r"(?<=<version>).*?(?=</version>)", resp.text)
+
+VERSION_SOURCES: Dict[str, tuple[str, str, Callable[[Any], Any]]] = {
+    "Vanilla": ("https://launchermeta.mojang.com/mc/game/version_manifest_v2.json", "versiones-minecraft.json", _parse_vanilla_versions),
+    "Forge": ("https://maven.minecraftforge.net/net/minecraftforge/forge/maven-metadata.xml", "versiones-forge.json", _parse_maven_versions),
+    "Fabric": ("https://meta.fabricmc.net/v2/versions/game", "versiones-fabric.json", lambda r: r.json()),
+    "Quilt": ("https://meta.quiltmc.org/v3/versions/game", "versiones-quilt.json", lambda r: r.json()),
+}
+VERSION_LIST_FORMAT = 2
+VERSIONS_TTL = int(os.getenv("GW_VERSIONS_TTL", str(6 * 3600)))
+_VERSIONS_CACHE_FILE = GW_DIR / "versiones-cache.json"
+_versions_cache = store.open_store(_VERSIONS_CACHE_FILE)
+
+def _refresh_version_list(label: str, meta: Dict[str, Any], force: bool) -> Dict[str, Any]:
+    url, filename, parse = VERSION_SOURCES[label]
+    path = GW_DIR / filename
+    now = int(time.time())
+    if not path.exists() or meta.get("format") != VERSION_LIST_FORMAT:
+        meta = {}
+    elif not force and now - meta.get("checked", 0) < VERSIONS_TTL:
+        return meta
+    headers = {}
+    if meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+    resp = http.session().get(url, headers=headers)
+    if resp.status_code == 304:
+        return {**meta, "checked": now}
+    resp.raise_for_status()
+    digest = hashlib.sha256(resp.content).hexdigest()
+    fresh = {"etag": resp.headers.get("ETag", ""), "last_modified": resp.headers.get("Last-Modified", ""), "digest": digest, "checked": now, "format": VERSION_LIST_FORMAT}
+    if digest == meta.get("digest"):
+        return fresh
+    store.atomic_write(path, json.dumps(parse(resp), indent=2, ensure_ascii=False, default=str), mode=0o644)
+    return fresh
+
+def _dump_available_versions_json(force: bool = False) -> None:
     _ensure_dir()
-    def save_if_changed(data: Any, path: Path, label: str) -> None:
-        new_json = json.dumps(data, indent=2, ensure_ascii=False, default=str)
-        if path.exists():
-            current = path.read_text(encoding="utf-8")
-            if current == new_json:
+    cache: Dict[str, Any] = _versions_cache.read()
+    with ThreadPoolExecutor(max_workers=len(VERSION_SOURCES)) as ex:
+        futures = {label: ex.submit(_refresh_version_list, label, cache.get(label, {}), force) for label in VERSION_SOURCES}
+    errors = []
+    for label, fut in futures.items():
+        try:
+            cache[label] = fut.result()
+        except Exception as e:
+            errors.append((label, e))
+    _versions_cache.write(cache)
+    if errors and errors[0][0] == "Vanilla":
+        raise errors[0][1]
+
+_INSTALL_MARKER = ".gw_complete"
+
+class _InstalledVersions:
+    def __init__(self, root: Path) -> None:
+        self._root = root
+        self._lock = threading.Lock()
+        self._mtime: Optional[int] = None
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._pending: Dict[str, int] = {}
+        self._by_base: Dict[str, List[str]] = {}
+
+    def _read(self, vdir: Path) -> Optional[Dict[str, Any]]:
+        meta = vdir / f"{vdir.name}.json"
+        try:
+            mtime = meta.stat().st_mtime_ns
+        except OSError:
+            return None
+        complete = (vdir / _INSTALL_MARKER).exists() or (vdir / f"{vdir.name}.jar").exists()
+        prev = self._entries.get(vdir.name)
+        if prev and prev["mtime"] == mtime:
+            return {**prev, "complete": complete}
+        try:
+            data = json.loads(meta.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        return {"id": data.get("id", vdir.name), "inheritsFrom": data.get("inheritsFrom"), "mtime": mtime, "complete": complete}
+
+    @staticmethod
+    def _dir_mtime(vdir: Path) -> Optional[int]:
+        try:
+            return vdir.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def _refresh(self) -> None:
+        try:
+            mtime = self._root.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = 0
+        if mtime != self._mtime:
+            dirs = [d for d in self._root.iterdir() if d.is_dir()] if mtime else []
+            entries: Dict[str, Dict[str, Any]] = {}
+            pending: Dict[str, int] = {}
+        else:
+            dirs = [self._root / name for name, seen in self._pending.items() if self._dir_mtime(self._root / name) != seen]
+            if not dirs:
                 return
-        path.write_text(new_json, encoding="utf-8")
-        if os.name == "posix":
-            os.chmod(path, 0o644)
-    try:
-        all_versions = mll.utils.get_version_list()
-    except AttributeError:
-        all_versions = mll.utils.get_available_versions()
-    save_if_changed(all_versions, GW_DIR / "versiones-minecraft.json", "Vanilla")
-    try:
-        forge_versions = mll.forge.list_forge_versions()
-        save_if_changed(forge_versions, GW_DIR / "versiones-forge.json", "Forge")
-    except Exception:
-        pass
-    try:
-        fabric_versions = mll.fabric.get_all_minecraft_versions()
-        save_if_changed(fabric_versions, GW_DIR / "versiones-fabric.json", "Fabric")
-    except Exception:
-        pass
-    try:
-        quilt_versions = mll.quilt.get_all_minecraft_versions()
-        save_if_changed(quilt_versions, GW_DIR / "versiones-quilt.json", "Quilt")
-    except Exception:
-        pass
+            entries, pending = dict(self._entries), dict(self._pending)
+        for vdir in dirs:
+            seen = self._dir_mtime(vdir)
+            entry = self._read(vdir)
+            entries.pop(vdir.name, None)
+            pending.pop(vdir.name, None)
+            if entry:
+                entries[vdir.name] = entry
+            if (not entry or not entry["complete"]) and seen is not None:
+                pending[vdir.name] = seen
+        by_base: Dict[str, List[str]] = {}
+        for vid, entry in sorted(entries.items(), key=lambda kv: kv[1]["mtime"]):
+            by_base.setdefault(entry["inheritsFrom"] or vid, []).append(vid)
+        self._entries, self._pending, self._by_base, self._mtime = entries, pending, by_base, mtime
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._mtime = None
+
+    def ids(self) -> List[str]:
+        with self._lock:
+            self._refresh()
+            return [vid for vid, entry in self._entries.items() if entry["complete"]]
+
+    def __contains__(self, version_id: str) -> bool:
+        with self._lock:
+            self._refresh()
+            entry = self._entries.get(version_id)
+            return bool(entry and entry["complete"])
+
+    def mark_complete(self, version_id: str) -> None:
+        (self._root / version_id / _INSTALL_MARKER).touch()
+        self.invalidate()
+
+    def loaders(self, minecraft_version: str, loader: str) -> List[str]:
+        with self._lock:
+            self._refresh()
+            return [vid for vid in self._by_base.get(minecraft_version, []) if loader in vid.lower()]
+
+_installed = _InstalledVersions(VERSIONS_DIR)
 
 def _installed_ids() -> List[str]:
     _ensure_dir()
-    return [v["id"] for v in utils.get_installed_versions(str(GW_DIR))]
+    return _installed.ids()
+
+def _latest_loader(version: str, loader: str) -> str:
+    _installed.invalidate()
+    found = _installed.loaders(version, loader)
+    if not found:
+        return version
+    _installed.mark_complete(found[-1])
+    _installs.finished(found[-1])
+    return found[-1]
+
+class _InstallTracker:
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._state: Dict[str, tuple[str, Optional[BaseException]]] = {}
+
+    def _set(self, version_id: str, state: str, error: Optional[BaseException] = None) -> None:
+        with self._cond:
+            self._state[version_id] = (state, error)
+            self._cond.notify_all()
+
+    @contextmanager
+    def track(self, version_id: str):
+        self._set(version_id, "running")
+        try:
+            yield
+        except BaseException as e:
+            self._set(version_id, "failed", e)
+            raise
+        self._set(version_id, "done")
+
+    def finished(self, version_id: str) -> None:
+        self._set(version_id, "done")
+
+    def status(self, version_id: str) -> tuple[Optional[str], Optional[BaseException]]:
+        with self._cond:
+            return self._state.get(version_id, (None, None))
 
-def install_version(version: str) -> None:
+    def wait(self, version_id: str, timeout: float) -> None:
+        with self._cond:
+            self._cond.wait_for(lambda: self._state.get(version_id, ("",))[0] != "running", timeout)
+
+_installs = _InstallTracker()
+
+def install_version(version: str, callback: Optional[Dict[str, Callable]] = None) -> None:
     _ensure_dir()
-    installed = _installed_ids()
-    if version in installed:
-        return
-    mll.install.install_minecraft_version(version, str(GW_DIR))
+    with _step_lock(f"version:{version}"):
+        if version in _installed:
+            _installs.finished(version)
+            return
+        with _installs.track(version), dl.scheduler().attached(callback) as callback:
+            mll.install.install_minecraft_version(version, str(GW_DIR), callback=callback)
+            _installed.mark_complete(version)
 
-def install_modloader(loader: ModLoader, version: str) -> str:
+def install_modloader(loader: ModLoader, version: str, callback: Optional[Dict[str, Callable]] = None) -> str:
+    with _step_lock("modloader"):
+        return _install_modloader(loader, version, callback or {})
+
+def _install_modloader(loader: ModLoader, version: str, callback: Dict[str, Callable]) -> str:
     _ensure_dir()
 
     global _real_popen
@@ -243,29 +755,32 @@ def install_modloader(loader: ModLoader, version: str) -> str:
     subprocess.Popen = _popen_no_window
 
     try:
-        if loader == "forge":
-            fv = mll.forge.find_forge_version(version)
-            if not fv or not mll.forge.supports_automatic_install(fv):
-                return version
-            mid = mll.forge.forge_to_installed_version(fv)
-            if mid not in _installed_ids():
-                mll.forge.install_forge_version(fv, str(GW_DIR))
-            return mid
-        if loader == "quilt":
-            try:
-                mll.quilt.install_quilt(version, str(GW_DIR))
-            except Exception:
-                return version
-            quilts = [vid for vid in _installed_ids() if version in vid and "quilt" in vid.lower()]
-            return quilts[-1] if quilts else version
-        if loader == "fabric":
-            try:
-                mll.fabric.install_fabric(version, str(GW_DIR))
-            except Exception:
-                return version
-            facs = [vid for vid in _installed_ids() if version in vid and "fabric" in vid.lower()]
-            return facs[-1] if facs else version
-        return version
+        with dl.scheduler().attached(callback) as callback:
+            if loader == "forge":
+                fv = mll.forge.find_forge_version(version)
+                if not fv or not mll.forge.supports_automatic_install(fv):
+                    return version
+                mid = mll.forge.forge_to_installed_version(fv)
+                if mid not in _installed:
+                    with _installs.track(mid):
+                        mll.forge.install_forge_version(fv, str(GW_DIR), callback=callback)
+                        _installed.mark_complete(mid)
+                else:
+                    _installs.finished(mid)
+                return mid
+            if loader == "quilt":
+                try:
+                    mll.quilt.install_quilt(version, str(GW_DIR), callback=callback)
+                except Exception:
+                    return version
+                return _latest_loader(version, "quilt")
+            if loader == "fabric":
+                try:
+                    mll.fabric.install_fabric(version, str(GW_DIR), callback=callback)
+                except Exception:
+                    return version
+                return _latest_loader(version, "fabric")
+            return version
     finally:
         subprocess.Popen = _real_popen
         
@@ -273,50 +788,317 @@ def _offline_options(username: str) -> mll.types.MinecraftOptions:
     u = uuid.uuid3(uuid.NAMESPACE_DNS, username)
     return {"username": username, "uuid": str(u).replace("-", ""), "token": "0"}
 
-def _detect_java_version(minecraft_version: str) -> int:
-    return get_required_java_version(minecraft_version)
+def _detect_java_version(version_id: str) -> int:
+    return get_required_java_version(version_id)
+
+def _modpack_target(member: str) -> Optional[str]:
+    if member.endswith("/"):
+        return None
+    if member.endswith(".jar"):
+        return Path(member).name
+    if member.startswith("mods/"):
+        rel_path = Path(member).relative_to("mods")
+        return None if ".." in rel_path.parts else rel_path.as_posix()
+    return None
+
+def _load_modpack_manifest(path: Path) -> Dict[str, Any]:
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except json.JSONDecodeError:
+        return {}
+
+def _file_crc32(path: Path) -> int:
+    crc = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+def _is_current(target: Path, entry: Dict[str, Any], applied: Optional[Dict[str, Any]]) -> bool:
+    if not target.is_file() or target.stat().st_size != entry["size"]:
+        return False
+    if applied and applied.get("crc") == entry["crc"] and applied.get("size") == entry["size"]:
+        return True
+    return _file_crc32(target) == entry["crc"]
+
+def _write_atomic(target: Path, src) -> None:
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(target.name + ".tmp")
+    with open(tmp, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.replace(tmp, target)
+
+def _remove_stale(mods_dir: Path, applied: Dict[str, Any], files: Dict[str, Any]) -> None:
+    for rel in set(applied) - set(files):
+        (mods_dir / rel).unlink(missing_ok=True)
+
+def _sync_modpack_files(mods_dir: Path, zf: zipfile.ZipFile, applied: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    files: Dict[str, Dict[str, Any]] = {}
+    for info in zf.infolist():
+        rel = _modpack_target(info.filename)
+        if rel is None:
+            continue
+        entry = {"crc": info.CRC, "size": info.file_size}
+        files[rel] = entry
+        target = mods_dir / rel
+        if _is_current(target, entry, applied.get(rel)):
+            continue
+        with zf.open(info) as src:
+            _write_atomic(target, src)
+    _remove_stale(mods_dir, applied, files)
+    return files
+
+def build_modpack_index(zip_path: Path) -> Dict[str, Any]:
+    files: Dict[str, Dict[str, Any]] = {}
+    with zipfile.ZipFile(zip_path, "r") as zf:
+        for info in zf.infolist():
+            rel = _modpack_target(info.filename)
+            if rel is None:
+                continue
+            h = hashlib.sha256()
+            with zf.open(info) as src:
+                for chunk in iter(lambda: src.read(1 << 16), b""):
+                    h.update(chunk)
+            files[rel] = {"member": info.filename, "crc": info.CRC, "size": info.file_size, "sha256": h.hexdigest()}
+    return {"format": 1, "archive_sha256": sha256sum(zip_path), "files": files}
+
+def _fetch_modpack_index() -> Optional[Dict[str, Any]]:
+    if not MODPACK_INDEX_SHA256:
+        return None
+    resp = http.session().get(MODPACK_INDEX_URL)
+    resp.raise_for_status()
+    if hashlib.sha256(resp.content).hexdigest() != MODPACK_INDEX_SHA256:
+        raise RuntimeError("El índice del modpack tiene un hash inválido")
+    index = resp.json()
+    if index.get("archive_sha256") != MODPACK_SHA256:
+        return None
+    return index
+
+def _sync_modpack_delta(mods_dir: Path, applied: Dict[str, Dict[str, Any]]) -> Optional[Dict[str, Dict[str, Any]]]:
+    index = _fetch_modpack_index()
+    if index is None:
+        return None
+    remote: Dict[str, Dict[str, Any]] = index["files"]
+    changed = [rel for rel, entry in remote.items() if not _is_current(mods_dir / rel, entry, applied.get(rel))]
+    total = sum(e["size"] for e in remote.values()) or 1
+    if sum(remote[rel]["size"] for rel in changed) > total * MODPACK_DELTA_MAX_RATIO:
+        return None
+    if changed:
+        rz = dl.RemoteZip(MODPACK_URL)
+        for rel in changed:
+            entry = remote[rel]
+            data = rz.read(entry["member"])
+            if hashlib.sha256(data).hexdigest() != entry["sha256"]:
+                raise RuntimeError(f"Hash inválido para {rel} en el modpack")
+            _write_atomic(mods_dir / rel, io.BytesIO(data))
+    _remove_stale(mods_dir, applied, remote)
+    return {rel: {"crc": e["crc"], "size": e["size"]} for rel, e in remote.items()}
 
-def _extract_flag_key(flag: str) -> str:
-    return flag.split("=", 1)[0]
+def _archive_stamp(path: Path) -> str:
+    st = path.stat()
+    return f"{st.st_size}:{st.st_mtime_ns}:{MODPACK_SHA256}"
 
-def _is_gc_flag(flag: str) -> bool:
-    return flag.startswith("-XX:+Use") and flag.endswith("GC")
+def fetch_modpack_archive(progress_cb: Optional[Callable[[int, str], None]] = None) -> Path:
+    archive = GW_DIR / "GW_ModPack.zip"
+    stamp_file = archive.with_name(archive.name + ".sha256")
+    with _step_lock("modpack-archive"):
+        if archive.exists():
+            try:
+                verified = stamp_file.read_text(encoding="utf-8") == _archive_stamp(archive)
+            except OSError:
+                verified = False
+            if not verified and sha256sum(archive) != MODPACK_SHA256:
+                archive.unlink(missing_ok=True)
+            elif not verified:
+                store.atomic_write(stamp_file, _archive_stamp(archive))
+        if not archive.exists():
+            try:
+                dl.download(MODPACK_URL, archive, sha256=MODPACK_SHA256, progress=_download_progress("Descargando modpack", progress_cb))
+            except dl.ChecksumMismatch as e:
+                raise RuntimeError("El modpack descargado tiene un hash inválido") from e
+            store.atomic_write(stamp_file, _archive_stamp(archive))
+    return archive
+
+def _sync_modpack_archive(mods_dir: Path, applied: Dict[str, Dict[str, Any]], progress_cb: Optional[Callable[[int, str], None]] = None) -> Dict[str, Dict[str, Any]]:
+    with zipfile.ZipFile(fetch_modpack_archive(progress_cb), "r") as zf:
+        return _sync_modpack_files(mods_dir, zf, applied)
+
+def ensure_modpack(game_dir: Path, progress_cb: Optional[Callable[[int, str], None]] = None) -> None:
+    with _step_lock(f"modpack:{game_dir}"):
+        _apply_modpack(game_dir, progress_cb)
 
-def ensure_modpack(game_dir: Path) -> None:
+def _apply_modpack(game_dir: Path, progress_cb: Optional[Callable[[int, str], None]] = None) -> None:
     mods_dir = game_dir / "mods"
-    marker = mods_dir / ".gw_modpack_applied"
     mods_dir.mkdir(parents=True, exist_ok=True)
-    if marker.exists():
+    manifest_file = mods_dir / MODPACK_MANIFEST
+    manifest = _load_modpack_manifest(manifest_file)
+    if manifest.get("source") == MODPACK_SHA256:
+        return
+    applied = manifest.get("files", {})
+    try:
+        files = _sync_modpack_delta(mods_dir, applied)
+    except Exception:
+        files = None
+    if files is None:
+        files = _sync_modpack_archive(mods_dir, applied, progress_cb)
+    store.atomic_write(manifest_file, json.dumps({"source": MODPACK_SHA256, "files": files}, indent=2))
+    (mods_dir / ".gw_modpack_applied").unlink(missing_ok=True)
+
+def _lower_thread_priority() -> None:
+    try:
+        if os.name == "nt":
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetThreadPriority(kernel32.GetCurrentThread(), -1)
+        elif sys.platform.startswith("linux"):
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+    except (AttributeError, OSError):
+        pass
+
+class Prefetcher:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._target: Optional[tuple[str, str, str]] = None
+
+    def start(self, version: str, loader: ModLoader, profile_name: str) -> None:
+        target = (version, loader, profile_name)
+        with self._lock:
+            if self._target == target and self._thread and self._thread.is_alive():
+                return
+            self._cancel.set()
+            self._cancel = cancel = threading.Event()
+            self._target = target
+            self._thread = threading.Thread(target=self._run, args=(*target, cancel), name="gw-prefetch", daemon=True)
+            self._thread.start()
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._cancel.set()
+            self._target = None
+
+    def _run(self, version: str, loader: ModLoader, profile_name: str, cancel: threading.Event) -> None:
+        _lower_thread_priority()
+        callback = {"isCancelled": cancel.is_set, "background": True}
+        def check(*_: Any) -> None:
+            if cancel.is_set():
+                raise dl.Cancelled(version)
+        try:
+            install_version(version, callback)
+            check()
+            real_id = install_modloader(loader, version, callback) if loader else version
+            check()
+            download_java_runtime(_detect_java_version(real_id), check, component=get_required_java_component(real_id))
+            check()
+            game_dir = INSTANCES_DIR / f"{real_id}_{profile_name}"
+            game_dir.mkdir(parents=True, exist_ok=True)
+            ensure_modpack(game_dir, check)
+        except Exception:
+            pass
+
+prefetcher = Prefetcher()
+
+@dataclass
+class Step:
+    name: str
+    run: Callable[[Dict[str, Any], Callable[[float, str], None]], Any]
+    after: tuple[str, ...] = ()
+    weight: int = 1
+
+def run_pipeline(steps: List[Step], progress_cb: Optional[Callable[[int, str], None]] = None, max_workers: int = 4) -> Dict[str, Any]:
+    pending = {s.name: s for s in steps}
+    total = sum(s.weight for s in steps) or 1
+    weights = {s.name: s.weight for s in steps}
+    fractions: Dict[str, float] = {}
+    results: Dict[str, Any] = {}
+    lock = threading.Lock()
+    last_text = [""]
+    def update(name: str, fraction: float, text: Optional[str]) -> None:
+        with lock:
+            fractions[name] = min(max(fraction, fractions.get(name, 0.0)), 1.0)
+            percent = int(sum(weights[n] * f for n, f in fractions.items()) * 100 / total)
+            if text is not None:
+                last_text[0] = text
+            text = last_text[0]
+        if progress_cb:
+            progress_cb(percent, text)
+    def reporter(step: Step) -> Callable[[float, str], None]:
+        return lambda fraction, text: update(step.name, fraction, text)
+    ex = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gw-launch")
+    running: Dict[Any, Step] = {}
+    try:
+        while pending or running:
+            for name, step in list(pending.items()):
+                if all(dep in results for dep in step.after):
+                    del pending[name]
+                    running[ex.submit(step.run, results, reporter(step))] = step
+            if not running:
+                raise RuntimeError(f"Dependencias sin resolver: {', '.join(pending)}")
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                step = running.pop(fut)
+                results[step.name] = fut.result()
+                update(step.name, 1.0, None)
+    except BaseException:
+        ex.shutdown(wait=False, cancel_futures=True)
+        raise
+    ex.shutdown()
+    return results
+
+_LAUNCH_CACHE_FILE = GW_DIR / "launch-cache.json"
+_launch_cache = store.open_store(_LAUNCH_CACHE_FILE, indent=None)
+_TOKEN_PLACEHOLDER = "${gw_access_token}"
+
+def _version_chain(version_id: str) -> List[tuple[bytes, Dict[str, Any]]]:
+    chain: List[tuple[bytes, Dict[str, Any]]] = []
+    vid: Optional[str] = version_id
+    while vid and len(chain) < 8:
+        raw = (VERSIONS_DIR / vid / f"{vid}.json").read_bytes()
+        data = json.loads(raw)
+        chain.append((raw, data))
+        vid = data.get("inheritsFrom")
+    return chain
+
+def _launch_cache_key(version_id: str, java_executable: Path, opts: Dict[str, Any]) -> Optional[str]:
+    try:
+        digests = [hashlib.sha256(raw).hexdigest() for raw, _ in _version_chain(version_id)]
+    except (OSError, ValueError):
+        return None
+    payload = {"versions": digests, "java": str(java_executable), "options": opts}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+def _classpath_stamps(command: List[str]) -> Dict[str, int]:
+    if "-cp" not in command:
+        return {}
+    stamps = {}
+    for entry in command[command.index("-cp") + 1].split(os.pathsep):
+        try:
+            stamps[entry] = os.stat(entry).st_mtime_ns
+        except OSError:
+            stamps[entry] = -1
+    return stamps
+
+def _cached_launch_command(version_id: str, game_dir: Path, key: Optional[str]) -> Optional[List[str]]:
+    if key is None:
+        return None
+    entry = _launch_cache.get(f"{version_id}|{game_dir}")
+    if not entry or entry.get("key") != key:
+        return None
+    command = entry["command"]
+    if _classpath_stamps(command) != entry.get("classpath"):
+        return None
+    return list(command)
+
+def _store_launch_command(version_id: str, game_dir: Path, key: Optional[str], command: List[str]) -> None:
+    if key is None:
         return
-    tmp_file = GW_DIR / "GW_ModPack.zip"
-    import requests as _rq
-    def _dl():
-        with _rq.get(MODPACK_URL, stream=True, timeout=60) as r:
-            r.raise_for_status()
-            with open(tmp_file, "wb") as f:
-                for chunk in r.iter_content(8192):
-                    f.write(chunk)
-    if not tmp_file.exists():
-        _dl()
-    if sha256sum(tmp_file) != MODPACK_SHA256:
-        tmp_file.unlink(missing_ok=True)
-        _dl()
-    if sha256sum(tmp_file) != MODPACK_SHA256:
-        tmp_file.unlink(missing_ok=True)
-        raise RuntimeError("El modpack descargado tiene un hash inválido")
-    with zipfile.ZipFile(tmp_file, "r") as zf:
-        for member in zf.namelist():
-            if member.endswith(".jar") and not member.endswith("/"):
-                target = mods_dir / Path(member).name
-                with zf.open(member) as src, open(target, "wb") as dst:
-                    shutil.copyfileobj(src, dst)
-            elif member.startswith("mods/") and not member.endswith("/"):
-                rel_path = Path(member).relative_to("mods")
-                target = mods_dir / rel_path
-                target.parent.mkdir(parents=True, exist_ok=True)
-                with zf.open(member) as src, open(target, "wb") as dst:
-                    shutil.copyfileobj(src, dst)
-    marker.write_text("ok", encoding="utf-8")
+    entry = {"key": key, "command": command, "classpath": _classpath_stamps(command)}
+    if _launch_cache.get(f"{version_id}|{game_dir}") == entry:
+        return
+    with _launch_cache.transaction() as cache:
+        cache[f"{version_id}|{game_dir}"] = entry
 
 def build_command(
     version_id: str,
@@ -329,8 +1111,10 @@ def build_command(
     server: Optional[str] = None,
     port: Optional[int] = None,
     progress_cb: Optional[Callable[[int, str], None]] = None,
+    login: Optional[Dict[str, str]] = None,
+    gc_log: Optional[Path] = None,
 ) -> List[str]:
-    opts = authb.get_login_options_for_username(username) or _offline_options(username)
+    opts = dict(login or authb.get_login_options_for_username(username) or _offline_options(username))
     opts["gameDirectory"] = str(game_dir)
     if os.name == "posix":
         os.chmod(game_dir, 0o755)
@@ -339,36 +1123,100 @@ def build_command(
     if port:
         opts["port"] = str(port)
     java_version = _detect_java_version(version_id)
-    java_executable = download_java_runtime(java_version, progress_cb)
-    user_flags: List[str] = list(jvm_args or [])
-    filtered_user_flags: List[str] = []
-    seen_keys = set(); seen_gc = False
-    for f in user_flags:
-        key = _extract_flag_key(f)
-        if _is_gc_flag(f):
-            if seen_gc:
-                continue
-            seen_gc = True
-        if key in seen_keys:
-            continue
-        seen_keys.add(key); filtered_user_flags.append(f)
-    if ram:
-        filtered_user_flags.append(f"-Xmx{ram}M")
+    java_executable = download_java_runtime(java_version, progress_cb, component=get_required_java_component(version_id))
+    try:
+        modded = len(_version_chain(version_id)) > 1
+    except (OSError, ValueError):
+        modded = False
+    tuned = jvm_flags.recommend(java_version, heap_mb=ram, modded=modded, mods=jvm_flags.count_mods(game_dir))
+    filtered_user_flags = jvm_flags.merge(tuned, ([f"-Xmx{ram}M"] if ram else []) + list(jvm_args or []))
+    if gc_log and not any(f.startswith(("-Xlog:gc", "-Xloggc")) for f in filtered_user_flags):
+        filtered_user_flags += jvm_flags.gc_log_flags(java_version, gc_log)
     if filtered_user_flags:
         opts["jvmArguments"] = filtered_user_flags
-    command = mll.command.get_minecraft_command(version_id, str(GW_DIR), opts)
-    command[0] = str(java_executable)
+    token = opts.pop("token", "")
+    key = _launch_cache_key(version_id, java_executable, opts)
+    command = _cached_launch_command(version_id, game_dir, key)
+    if command is None:
+        opts["token"] = _TOKEN_PLACEHOLDER
+        command = mll.command.get_minecraft_command(version_id, str(GW_DIR), opts)
+        command[0] = str(java_executable)
+        _store_launch_command(version_id, game_dir, key, command)
+    command = [arg.replace(_TOKEN_PLACEHOLDER, token) for arg in command]
+    if optimize and not any(f.startswith(("-Xshare", "-XX:SharedArchiveFile", "-XX:ArchiveClassesAtExit")) for f in filtered_user_flags):
+        command[1:1] = _cds_flags(version_id, java_version, command, game_dir)
     return command
 
+def _has_base_cds(java_executable: str) -> bool:
+    java_home = Path(shutil.which(java_executable) or java_executable).resolve().parent.parent
+    server = java_home / ("bin" if os.name == "nt" else "lib") / "server"
+    return (server / "classes.jsa").exists() or (server / "classes_nocoops.jsa").exists()
+
+def _cds_flags(version_id: str, java_version: int, command: List[str], game_dir: Path) -> List[str]:
+    if java_version < 13 or not _has_base_cds(command[0]):
+        return []
+    h = hashlib.sha256(command[0].encode())
+    if "-cp" in command:
+        h.update(command[command.index("-cp") + 1].encode())
+    mods = game_dir / "mods"
+    if mods.is_dir():
+        for jar in sorted(mods.rglob("*.jar")):
+            st = jar.stat()
+            h.update(f"{jar.relative_to(mods).as_posix()}:{st.st_size}:{st.st_mtime_ns}".encode())
+    archive_dir = CDS_DIR / version_id
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    archive = archive_dir / f"{game_dir.name}-{h.hexdigest()[:16]}.jsa"
+    attempt = archive.with_suffix(".dump")
+    for old in archive_dir.glob(f"{glob.escape(game_dir.name)}-*"):
+        if old not in (archive, attempt) and old.stem.rsplit("-", 1)[0] == game_dir.name:
+            old.unlink(missing_ok=True)
+    if java_version >= 19:
+        return [f"-XX:SharedArchiveFile={archive}", "-XX:+AutoCreateSharedArchive"]
+    if archive.exists():
+        return [f"-XX:SharedArchiveFile={archive}"]
+    if attempt.exists():
+        return []
+    attempt.touch()
+    return [f"-XX:ArchiveClassesAtExit={archive}"]
+
+_IN_MOVED_TO, _IN_CREATE = 0x80, 0x100
+
+def _wait_for_file(path: Path, timeout: float) -> bool:
+    if not sys.platform.startswith("linux"):
+        return False
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (OSError, AttributeError):
+        return False
+    if fd < 0:
+        return False
+    try:
+        watched = path.parent if path.parent.is_dir() else VERSIONS_DIR
+        if libc.inotify_add_watch(fd, os.fsencode(watched), _IN_CREATE | _IN_MOVED_TO) < 0:
+            return False
+        if not path.exists():
+            select.select([fd], [], [], timeout)
+        return True
+    finally:
+        os.close(fd)
+
 def _wait_for_version(version_id: str, timeout_s: int = 600) -> None:
-    version_path = VERSIONS_DIR / version_id
-    expected_jar = version_path / f"{version_id}.jar"
-    start = time.time()
-    while time.time() - start < timeout_s:
-        if expected_jar.exists():
-            return
-        time.sleep(0.5)
-    raise TimeoutError(f"Tiempo agotado esperando la versión {version_id}")
+    expected_jar = VERSIONS_DIR / version_id / f"{version_id}.jar"
+    deadline = time.monotonic() + timeout_s
+    while not expected_jar.exists():
+        state, error = _installs.status(version_id)
+        if state == "failed":
+            raise RuntimeError(f"La instalación de {version_id} falló: {error}") from error
+        if state == "done":
+            raise RuntimeError(f"La instalación de {version_id} terminó pero falta {expected_jar.name}")
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"Tiempo agotado esperando la versión {version_id}")
+        if state == "running":
+            _installs.wait(version_id, remaining)
+        elif not _wait_for_file(expected_jar, min(remaining, 30)):
+            time.sleep(0.5)
 
 def launch_detached(cmd: list[str], cwd: str) -> None:
     if os.name == "nt":
@@ -395,7 +1243,11 @@ def _parse_cli(argv: List[str] | None = None) -> argparse.Namespace:
     l.add_argument("--ram", type=int, help="Memoria máxima en MiB (p. ej. 4096)")
     l.add_argument("--modloader", choices=["", "forge", "fabric", "quilt"], default="")
     l.add_argument("--jvm-arg", dest="jvm_args", action="append", metavar="ARG")
+    l.add_argument("--optimize", action="store_true", help="Usa un archivo AppCDS por versión para acelerar el arranque")
     sub.add_parser("versions", help="Muestra las versiones instaladas")
+    m = sub.add_parser("modpack-index", help="Genera el índice por archivo de un GW_ModPack.zip")
+    m.add_argument("zip")
+    m.add_argument("-o", "--output", default="GW_ModPack.json")
     return p.parse_args(argv)
 
 def _main() -> None:
@@ -412,10 +1264,14 @@ def _main() -> None:
         if os.name == "posix":
             os.chmod(game_dir, 0o755)
         save_profile(args.username, args.version)
-        cmd = build_command(real_id, args.username, game_dir=game_dir, ram=args.ram, jvm_args=args.jvm_args, optimize=False)
+        cmd = build_command(real_id, args.username, game_dir=game_dir, ram=args.ram, jvm_args=args.jvm_args, optimize=args.optimize)
         launch_attached(cmd, str(GW_DIR)).wait()
     elif args.cmd == "versions":
         print("\n".join(sorted(_installed_ids())))
+    elif args.cmd == "modpack-index":
+        out = Path(args.output)
+        out.write_text(json.dumps(build_modpack_index(Path(args.zip)), indent=2), encoding="utf-8")
+        print(f"{out}: sha256 {sha256sum(out)}")
     else:
         sys.exit(1)
 
@@ -0,0 +1,116 @@
+# http_cache.py
+from __future__ import annotations
+import hashlib, json, threading, time
+from pathlib import Path
+from typing import Any, Dict, Optional
+from urllib.parse import urlencode
+import http_client as http
+import store
+
+class ResponseCache:
+    def __init__(self, root: Path, max_bytes: int, index_delay: float = 2.0):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._index = store.open_store(root / "index.json", delay=index_delay)
+        self._lock = threading.Lock()
+        self._revalidating: set = set()
+        self._sweep()
+
+    def _sweep(self, grace: float = 60.0) -> None:
+        if not self.root.is_dir():
+            return
+        indexed = set(self._index.keys())
+        cutoff = time.time() - grace
+        for path in self.root.iterdir():
+            if path.name == "index.json" or (path.name.startswith(".") and not path.name.endswith(".tmp")):
+                continue
+            if path.stem in indexed:
+                continue
+            try:
+                if path.is_file() and path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except OSError:
+                pass
+
+    def _key(self, url: str, params: Optional[Dict[str, Any]]) -> str:
+        full = f"{url}?{urlencode(sorted(params.items()))}" if params else url
+        return hashlib.sha1(full.encode()).hexdigest()
+
+    def _read(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads((self.root / f"{key}.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def _touch(self, key: str, size: Optional[int] = None) -> None:
+        with self._index.transaction() as index:
+            entry = index.setdefault(key, {"size": 0})
+            entry["used"] = time.time()
+            if size is not None:
+                entry["size"] = size
+
+    def _write(self, key: str, entry: Dict[str, Any]) -> None:
+        text = json.dumps(entry, ensure_ascii=False)
+        store.atomic_write(self.root / f"{key}.json", text)
+        self._touch(key, len(text.encode("utf-8")))
+        self._evict()
+
+    def _evict(self) -> None:
+        with self._index.transaction() as index:
+            total = sum(e.get("size", 0) for e in index.values())
+            for key in sorted(index, key=lambda k: index[k].get("used", 0)):
+                if total <= self.max_bytes:
+                    break
+                total -= index.pop(key).get("size", 0)
+                (self.root / f"{key}.json").unlink(missing_ok=True)
+
+    def _fetch(self, key: str, url: str, params: Optional[Dict[str, Any]], cached: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        headers = {}
+        if cached and cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached and cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+        resp = http.get(url, params=params, headers=headers)
+        if resp.status_code == 304 and cached:
+            entry = {**cached, "fetched": time.time()}
+        else:
+            resp.raise_for_status()
+            entry = {"etag": resp.headers.get("ETag", ""), "last_modified": resp.headers.get("Last-Modified", ""), "fetched": time.time(), "data": resp.json()}
+        self._write(key, entry)
+        return entry
+
+    def _revalidate(self, key: str, url: str, params: Optional[Dict[str, Any]], cached: Dict[str, Any]) -> None:
+        with self._lock:
+            if key in self._revalidating:
+                return
+            self._revalidating.add(key)
+        def run():
+            try:
+                self._fetch(key, url, params, cached)
+            except Exception:
+                pass
+            finally:
+                with self._lock:
+                    self._revalidating.discard(key)
+        threading.Thread(target=run, name="gw-cache-revalidate", daemon=True).start()
+
+    def get_json(self, url: str, params: Optional[Dict[str, Any]] = None, *, ttl: float, stale_ttl: float = 0) -> Any:
+        key = self._key(url, params)
+        cached = self._read(key)
+        if cached is not None:
+            age = time.time() - cached.get("fetched", 0)
+            if age < ttl + stale_ttl:
+                self._touch(key)
+                if age >= ttl:
+                    self._revalidate(key, url, params, cached)
+                return cached["data"]
+        try:
+            return self._fetch(key, url, params, cached)["data"]
+        except Exception:
+            if cached is None:
+                raise
+            self._touch(key)
+            return cached["data"]
+
+    def flush(self) -> None:
+        self._index.flush()
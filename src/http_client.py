@@ -0,0 +1,119 @@
+# http_client.py
+from __future__ import annotations
+import os, threading, time
+from typing import Any, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+try:
+    import httpx
+except Exception:
+    httpx = None
+
+DEFAULT_TIMEOUT = (10, 60)
+POOL_CONNECTIONS = 16
+POOL_MAXSIZE = 32
+RETRIES = 3
+BACKOFF = 0.5
+RETRY_STATUS = (429, 500, 502, 503, 504)
+HTTP2 = os.getenv("GW_HTTP2", "0") == "1"
+USER_AGENT = "GWLauncher"
+
+_lock = threading.Lock()
+_session: Optional[requests.Session] = None
+_api: Any = None
+
+class _Session(requests.Session):
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+        return super().request(method, url, **kwargs)
+
+def new_session(pool_maxsize: int = POOL_MAXSIZE, retries: int = RETRIES) -> requests.Session:
+    retry = Retry(
+        total=retries,
+        backoff_factor=BACKOFF,
+        status_forcelist=RETRY_STATUS,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=pool_maxsize, max_retries=retry)
+    s = _Session()
+    s.headers["User-Agent"] = USER_AGENT
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    return s
+
+def session() -> requests.Session:
+    global _session
+    with _lock:
+        if _session is None:
+            _session = new_session()
+        return _session
+
+class _Http2Response:
+    def __init__(self, resp: Any):
+        self._resp = resp
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._resp, name)
+
+    @property
+    def ok(self) -> bool:
+        return self._resp.is_success
+
+    def raise_for_status(self) -> None:
+        if self._resp.is_error:
+            raise requests.HTTPError(f"{self._resp.status_code} Error: {self._resp.reason_phrase} for url: {self._resp.url}", response=self)
+
+class _Http2Client:
+    def __init__(self, client: Any):
+        self._client = client
+
+    def request(self, method: str, url: str, **kwargs) -> _Http2Response:
+        timeout = kwargs.pop("timeout", None)
+        if isinstance(timeout, tuple):
+            kwargs["timeout"] = httpx.Timeout(timeout[1], connect=timeout[0])
+        elif timeout is not None:
+            kwargs["timeout"] = timeout
+        if "allow_redirects" in kwargs:
+            kwargs["follow_redirects"] = kwargs.pop("allow_redirects")
+        for attempt in range(RETRIES + 1):
+            try:
+                resp = self._client.request(method, url, **kwargs)
+            except httpx.TimeoutException as e:
+                raise requests.Timeout(str(e)) from e
+            except httpx.TransportError as e:
+                raise requests.ConnectionError(str(e)) from e
+            if resp.status_code not in RETRY_STATUS or attempt == RETRIES:
+                return _Http2Response(resp)
+            retry_after = resp.headers.get("Retry-After", "")
+            time.sleep(float(retry_after) if retry_after.isdigit() else BACKOFF * (2 ** attempt))
+        return _Http2Response(resp)
+
+    def get(self, url: str, **kwargs) -> _Http2Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> _Http2Response:
+        return self.request("POST", url, **kwargs)
+
+def _new_http2_client() -> Any:
+    if httpx is None or not HTTP2:
+        return None
+    try:
+        transport = httpx.HTTPTransport(http2=True, retries=RETRIES, limits=httpx.Limits(max_connections=POOL_MAXSIZE, max_keepalive_connections=POOL_CONNECTIONS))
+        return _Http2Client(httpx.Client(transport=transport, timeout=httpx.Timeout(DEFAULT_TIMEOUT[1], connect=DEFAULT_TIMEOUT[0]), follow_redirects=True, headers={"User-Agent": USER_AGENT}))
+    except Exception:
+        return None
+
+def api() -> Any:
+    global _api
+    with _lock:
+        if _api is None:
+            _api = _new_http2_client() or False
+    return _api or session()
+
+def get(url: str, **kwargs) -> Any:
+    return api().get(url, **kwargs)
+
+def post(url: str, **kwargs) -> Any:
+    return api().post(url, **kwargs)
@@ -0,0 +1,195 @@
+# jvm_flags.py
+from __future__ import annotations
+import ctypes, os, re
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+MIN_HEAP_MB = 1024
+OS_RESERVE_MB = 2048
+VANILLA_HEAP_MB = 2048
+MODDED_HEAP_MB = 4096
+HEAP_PER_MOD_MB = 24
+ZGC_MIN_HEAP_MB = 8192
+ZGC_MIN_CORES = 6
+HEAP_HEADROOM = 2.0
+ZGC_HEAP_HEADROOM = 2.5
+
+_GC_AFTER = re.compile(r"(\d+)M(?:\(\d+%\))?->(\d+)M")
+_GC_PAUSE = re.compile(r"\bPause\b.*?([\d.]+)ms\s*$")
+
+_GC_TUNING = (
+    "-XX:+UseG1GC", "-XX:+UseZGC", "-XX:+UseSerialGC", "-XX:+ZGenerational", "-XX:G1", "-XX:MaxGCPauseMillis",
+    "-XX:InitiatingHeapOccupancyPercent", "-XX:SurvivorRatio", "-XX:MaxTenuringThreshold", "-XX:+ParallelRefProcEnabled",
+    "-XX:ParallelGCThreads", "-XX:ConcGCThreads",
+)
+
+@dataclass(frozen=True)
+class Hardware:
+    cores: int
+    memory_mb: int
+
+def _total_memory_mb() -> int:
+    if os.name == "nt":
+        class MEMORYSTATUSEX(ctypes.Structure):
+            _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong), ("ullTotalPhys", ctypes.c_ulonglong),
+                        ("ullAvailPhys", ctypes.c_ulonglong), ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong),
+                        ("ullTotalVirtual", ctypes.c_ulonglong), ("ullAvailVirtual", ctypes.c_ulonglong), ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+        stat = MEMORYSTATUSEX()
+        stat.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(stat)):
+            return stat.ullTotalPhys // (1 << 20)
+        return 8192
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // (1 << 20)
+    except (ValueError, OSError, AttributeError):
+        return 8192
+
+@lru_cache(maxsize=1)
+def detect_hardware() -> Hardware:
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 2
+    return Hardware(cores=max(1, cores), memory_mb=_total_memory_mb())
+
+def count_mods(game_dir: Optional[Path]) -> int:
+    mods = game_dir / "mods" if game_dir else None
+    return sum(1 for _ in mods.glob("*.jar")) if mods and mods.is_dir() else 0
+
+def recommended_heap_mb(modded: bool, mods: int = 0, hw: Optional[Hardware] = None) -> int:
+    hw = hw or detect_hardware()
+    want = MODDED_HEAP_MB + max(0, mods - 50) * HEAP_PER_MOD_MB if modded or mods else VANILLA_HEAP_MB
+    ceiling = max(MIN_HEAP_MB, min(hw.memory_mb - OS_RESERVE_MB, hw.memory_mb // 2 if hw.memory_mb <= 8192 else hw.memory_mb * 3 // 4))
+    return max(MIN_HEAP_MB, min(want, ceiling) // 256 * 256)
+
+def _region_size_mb(heap_mb: int) -> int:
+    if heap_mb < 4096:
+        return 4
+    if heap_mb < 8192:
+        return 8
+    return 16 if heap_mb < 16384 else 32
+
+def _gc_threads(cores: int) -> tuple[int, int]:
+    parallel = max(1, cores - 1) if cores <= 8 else 8 + (cores - 8) * 5 // 8
+    return parallel, max(1, parallel // 4)
+
+def recommend(java_version: int, *, heap_mb: Optional[int] = None, modded: bool = False, mods: int = 0, hw: Optional[Hardware] = None) -> List[str]:
+    hw = hw or detect_hardware()
+    heap = heap_mb or recommended_heap_mb(modded, mods, hw)
+    roomy = hw.memory_mb >= heap * 2 + OS_RESERVE_MB
+    flags = [f"-Xms{heap if roomy else max(MIN_HEAP_MB, heap // 2)}M", f"-Xmx{heap}M"]
+    parallel, concurrent = _gc_threads(hw.cores)
+    if hw.cores == 1:
+        flags.append("-XX:+UseSerialGC")
+    elif java_version >= 21 and hw.cores >= ZGC_MIN_CORES and heap >= ZGC_MIN_HEAP_MB:
+        flags.append("-XX:+UseZGC")
+        if java_version < 23:
+            flags.append("-XX:+ZGenerational")
+        flags.append(f"-XX:ConcGCThreads={concurrent}")
+    else:
+        large = heap >= 12288
+        flags += [
+            "-XX:+UseG1GC", "-XX:+ParallelRefProcEnabled", "-XX:MaxGCPauseMillis=200",
+            "-XX:+UnlockExperimentalVMOptions",
+            f"-XX:G1NewSizePercent={40 if large else 30}", f"-XX:G1MaxNewSizePercent={50 if large else 40}",
+            f"-XX:G1HeapRegionSize={_region_size_mb(heap)}M", f"-XX:G1ReservePercent={15 if large else 20}",
+            "-XX:G1HeapWastePercent=5", "-XX:G1MixedGCCountTarget=4",
+            f"-XX:InitiatingHeapOccupancyPercent={20 if large else 15}", "-XX:G1MixedGCLiveThresholdPercent=90",
+            "-XX:G1RSetUpdatingPauseTimePercent=5", "-XX:SurvivorRatio=32", "-XX:MaxTenuringThreshold=1",
+            f"-XX:ParallelGCThreads={parallel}", f"-XX:ConcGCThreads={concurrent}",
+        ]
+    flags += ["-XX:+DisableExplicitGC", "-XX:+PerfDisableSharedMem"]
+    if roomy:
+        flags.append("-XX:+AlwaysPreTouch")
+    return flags
+
+def flag_key(flag: str) -> str:
+    if flag.startswith("-XX:"):
+        name = flag[4:].split("=", 1)[0]
+        return "-XX:" + name.lstrip("+-")
+    if flag.startswith("-D"):
+        return flag.split("=", 1)[0]
+    for prefix in ("-Xmx", "-Xms", "-Xss", "-Xmn"):
+        if flag.startswith(prefix):
+            return prefix
+    return flag.split("=", 1)[0]
+
+def is_gc_flag(flag: str) -> bool:
+    return flag.startswith("-XX:+Use") and flag.endswith("GC")
+
+_SIZE_UNITS = {"": 1 / (1 << 20), "k": 1 / 1024, "m": 1, "g": 1024, "t": 1 << 20}
+
+def _size_mb(value: str) -> Optional[float]:
+    m = re.fullmatch(r"(\d+)([kKmMgGtT]?)", value)
+    return int(m.group(1)) * _SIZE_UNITS[m.group(2).lower()] if m else None
+
+def merge(tuned: List[str], user: List[str]) -> List[str]:
+    user_flags: List[str] = []
+    seen_keys = set(); seen_gc = False
+    for f in user:
+        key = flag_key(f)
+        if is_gc_flag(f):
+            if seen_gc:
+                continue
+            seen_gc = True
+        if key in seen_keys:
+            continue
+        seen_keys.add(key); user_flags.append(f)
+    base = [f for f in tuned if flag_key(f) not in seen_keys and not (seen_gc and f.startswith(_GC_TUNING))]
+    merged = base + user_flags
+    heap = {flag_key(f): i for i, f in enumerate(merged) if flag_key(f) in ("-Xms", "-Xmx")}
+    if len(heap) == 2:
+        xms, xmx = merged[heap["-Xms"]][4:], merged[heap["-Xmx"]][4:]
+        if (_size_mb(xms) or 0) > (_size_mb(xmx) or float("inf")):
+            if heap["-Xms"] < len(base):
+                merged[heap["-Xms"]] = "-Xms" + xmx
+            elif heap["-Xmx"] < len(base):
+                merged[heap["-Xmx"]] = "-Xmx" + xms
+    return merged
+
+def gc_log_flags(java_version: int, path: Path) -> List[str]:
+    if java_version < 9:
+        return []
+    return [f'-Xlog:gc:file="{path}":uptime,level,tags']
+
+def parse_gc_log(path: Path) -> Optional[Dict[str, Any]]:
+    peak = 0; pauses: List[float] = []; full = 0; zgc = False
+    try:
+        with open(path, encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                if "GC(" not in line:
+                    continue
+                after = _GC_AFTER.search(line)
+                if after:
+                    peak = max(peak, int(after.group(2)))
+                pause = _GC_PAUSE.search(line)
+                if pause:
+                    pauses.append(float(pause.group(1)))
+                    full += "Pause Full" in line
+                zgc = zgc or "Garbage Collection" in line or "Major Collection" in line
+    except OSError:
+        return None
+    if not peak and not pauses:
+        return None
+    return {
+        "peak_live_mb": peak,
+        "pauses": len(pauses),
+        "max_pause_ms": round(max(pauses, default=0.0), 3),
+        "avg_pause_ms": round(sum(pauses) / len(pauses), 3) if pauses else 0.0,
+        "full_gcs": full,
+        "zgc": zgc,
+    }
+
+def suggest_heap_mb(sessions: List[Dict[str, Any]], hw: Optional[Hardware] = None) -> Optional[int]:
+    if not sessions:
+        return None
+    hw = hw or detect_hardware()
+    peak = max(s["peak_live_mb"] for s in sessions)
+    want = peak * (ZGC_HEAP_HEADROOM if sessions[-1].get("zgc") else HEAP_HEADROOM)
+    last = sessions[-1]
+    if last.get("full_gcs") and last.get("heap_mb"):
+        want = max(want, last["heap_mb"] * 1.25)
+    ceiling = max(MIN_HEAP_MB, hw.memory_mb - OS_RESERVE_MB)
+    return max(MIN_HEAP_MB, min(ceiling, -(-int(want) // 256) * 256))
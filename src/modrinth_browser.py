@@ -1,5 +1,5 @@
 # modrinth_browser.py
-import sys, json, urllib.request, base64, zlib
+import sys, os, json, base64, zlib
 from pathlib import Path
 from PySide6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout,
@@ -10,26 +10,37 @@ from PySide6.QtWidgets import (
 from PySide6.QtCore import Qt, QPoint, QThreadPool, QRunnable, Signal, QObject
 from PySide6.QtGui import QPixmap, QPalette, QBrush, QIcon, QPainter, QColor
 from gw_launcher import BASE_DIR, GW_DIR, PALETTE, ASSETS
+import http_client as http
+from http_cache import ResponseCache
 
 INSTANCES_DIR = GW_DIR / "instances"
 INSTANCES_DIR.mkdir(parents=True, exist_ok=True)
 
+SEARCH_TTL = 10 * 60
+POPULAR_TTL = 6 * 3600
+VERSIONS_TTL = 30 * 60
+STALE_TTL = 7 * 24 * 3600
+CACHE_MAX_MB = int(os.getenv("GW_MODRINTH_CACHE_MB", "64"))
+_cache = ResponseCache(GW_DIR / "modrinth-cache", CACHE_MAX_MB << 20)
+
 def fetch_modrinth_search(query: str, limit=20, popular=False):
     if popular:
-        url = f"https://api.modrinth.com/v2/search?limit={limit}&index=downloads"
+        params = {"limit": limit, "index": "downloads"}
     else:
-        url = f"https://api.modrinth.com/v2/search?query={query}&limit={limit}"
-    with urllib.request.urlopen(url) as resp:
-        return json.loads(resp.read().decode("utf-8")).get("hits", [])
+        params = {"query": query, "limit": limit}
+    data = _cache.get_json("https://api.modrinth.com/v2/search", params, ttl=POPULAR_TTL if popular else SEARCH_TTL, stale_ttl=STALE_TTL)
+    return data.get("hits", [])
 
 def fetch_mod_versions(mod_id: str):
-    url = f"https://api.modrinth.com/v2/project/{mod_id}/version"
-    with urllib.request.urlopen(url) as resp:
-        return json.loads(resp.read().decode("utf-8"))
+    return _cache.get_json(f"https://api.modrinth.com/v2/project/{mod_id}/version", ttl=VERSIONS_TTL, stale_ttl=STALE_TTL)
 
 def download_file(url: str, dest: Path):
     dest.parent.mkdir(parents=True, exist_ok=True)
-    urllib.request.urlretrieve(url, dest)
+    with http.session().get(url, stream=True) as resp:
+        resp.raise_for_status()
+        with open(dest, "wb") as f:
+            for chunk in resp.iter_content(1 << 16):
+                f.write(chunk)
 
 class WorkerSignals(QObject):
     result = Signal(object)
@@ -102,7 +113,7 @@ class ModCard(QWidget):
             QThreadPool.globalInstance().start(worker)
 
     def _load_icon(self, url):
-        data = urllib.request.urlopen(url).read()
+        data = http.get(url).content
         pixmap = QPixmap()
         pixmap.loadFromData(data)
         return pixmap
@@ -0,0 +1,195 @@
+# store.py
+from __future__ import annotations
+import atexit, copy, json, os, threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+FSYNC = os.getenv("GW_FSYNC", "0") == "1"
+
+_registry_lock = threading.Lock()
+_registry: Dict[Path, "JsonStore"] = {}
+_registry_options: Dict[Path, tuple] = {}
+
+@contextmanager
+def _file_lock(path: Path) -> Iterator[None]:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+b") as f:
+        if os.name == "nt":
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+def atomic_write(path: Path, text: str, *, fsync: bool = FSYNC, mode: Optional[int] = None) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        if mode is not None and os.name == "posix":
+            os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+class JsonStore:
+    def __init__(self, path: Path, default: Callable[[], Any] = dict, *, fsync: bool = FSYNC, mode: Optional[int] = 0o644, delay: float = 0.0, indent: Optional[int] = 2):
+        self.path = path
+        self._default = default
+        self._fsync = fsync
+        self._mode = mode
+        self._delay = delay
+        self._indent = indent
+        self._lock = threading.RLock()
+        self._lock_path = path.with_name(f".{path.name}.lock")
+        self._data: Any = None
+        self._base: Any = None
+        self._text: Optional[str] = None
+        self._stamp: Optional[tuple[int, int]] = None
+        self._indexes: Dict[str, Dict[Any, Any]] = {}
+        self._dirty = False
+        self._timer: Optional[threading.Timer] = None
+
+    def _disk_stamp(self) -> Optional[tuple[int, int]]:
+        try:
+            st = self.path.stat()
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _load(self) -> Any:
+        if self._dirty:
+            return self._data
+        stamp = self._disk_stamp()
+        if self._data is not None and stamp == self._stamp:
+            return self._data
+        try:
+            text = self.path.read_text(encoding="utf-8")
+            data = json.loads(text)
+        except (OSError, ValueError):
+            text, data = None, self._default()
+        self._data, self._text, self._stamp = data, text, stamp
+        if self._delay:
+            self._base = copy.deepcopy(data)
+        self._indexes.clear()
+        return data
+
+    def read(self) -> Any:
+        with self._lock:
+            return copy.deepcopy(self._load())
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            value = self._load().get(key, default)
+            return copy.deepcopy(value)
+
+    def keys(self) -> list:
+        with self._lock:
+            return list(self._load())
+
+    def lookup(self, field: str, value: Any) -> Optional[str]:
+        with self._lock:
+            data = self._load()
+            index = self._indexes.get(field)
+            if index is None:
+                index = self._indexes[field] = {}
+                for key, entry in data.items():
+                    if isinstance(entry, dict) and field in entry:
+                        index.setdefault(entry[field], key)
+            return index.get(value)
+
+    @contextmanager
+    def _mutate(self) -> Iterator[Any]:
+        data = self._load()
+        try:
+            yield data
+        except BaseException:
+            if not self._dirty:
+                self._data = None
+            raise
+        self._indexes.clear()
+
+    @contextmanager
+    def transaction(self) -> Iterator[Any]:
+        with self._lock:
+            if self._delay:
+                with self._mutate() as data:
+                    yield data
+                self._dirty = True
+                if self._timer is None:
+                    self._timer = threading.Timer(self._delay, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+                return
+            with _file_lock(self._lock_path):
+                with self._mutate() as data:
+                    yield data
+                self._commit()
+
+    def write(self, data: Any) -> None:
+        with self.transaction():
+            self._data = copy.deepcopy(data)
+
+    def _commit(self) -> None:
+        text = json.dumps(self._data, indent=self._indent, ensure_ascii=False)
+        if text != self._text or self._disk_stamp() is None:
+            atomic_write(self.path, text, fsync=self._fsync, mode=self._mode)
+        self._text, self._stamp, self._dirty = text, self._disk_stamp(), False
+        if self._delay:
+            self._base = copy.deepcopy(self._data)
+
+    def _merge_disk(self) -> None:
+        base, data = self._base, self._data
+        self._data, self._dirty = None, False
+        disk = self._load()
+        if not isinstance(base, dict) or not isinstance(data, dict) or not isinstance(disk, dict):
+            self._data = data
+            return
+        for key in base.keys() - data.keys():
+            disk.pop(key, None)
+        for key, value in data.items():
+            if key not in base or base[key] != value:
+                disk[key] = value
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._dirty:
+                with _file_lock(self._lock_path):
+                    self._merge_disk()
+                    self._commit()
+
+def open_store(path: Path, default: Callable[[], Any] = dict, **options: Any) -> JsonStore:
+    key = path.expanduser().absolute()
+    with _registry_lock:
+        if key not in _registry:
+            _registry[key] = JsonStore(path, default, **options)
+            _registry_options[key] = (default, options)
+        elif _registry_options[key] != (default, options):
+            raise RuntimeError(f"{path} ya está abierto con otras opciones")
+        return _registry[key]
+
+@atexit.register
+def _flush_all() -> None:
+    with _registry_lock:
+        stores = list(_registry.values())
+    for s in stores:
+        s.flush()